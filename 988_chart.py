@@ -6,17 +6,19 @@ import logging
 from datetime import datetime
 from urllib.parse import urljoin
 from dotenv import load_dotenv
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException
-import time
 
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from blogger_client import get_client, weekly_post
+from chart_analytics import apply_snapshot, annotate_chart
+from chart_render import render
+from change_detect import chart_fingerprint, is_unchanged, mark_done, publish_if_changed
+from chrome_pool import chrome_tab
+from dom_extract import STATION_SPECS
+from http_first import fetch_station_rows, parse_rows
+from snapshot_store import save_snapshot
+from page_ready import wait_until, rows_stable, dismiss_modal
 
 load_dotenv()
 
@@ -29,69 +31,64 @@ logging.basicConfig(
     ]
 )
 
-def get_988_chart():
-    try:
-        options = Options()
-        options.add_argument('--headless')
-        options.add_argument('--disable-gpu')
-        options.add_argument('--no-sandbox')
-
-        driver = webdriver.Chrome(options=options)
+def fetch_988_rows_browser(pool=None):
+    with chrome_tab(pool, "988") as driver:
         chart_url = "https://988.com.my/music_chart/"
         driver.get(chart_url)
 
-        time.sleep(3)  # Allow modal to load
+        # Wait for whichever comes first: the login modal or the chart rows
+        modal_selector = ".modal-close-button, .modal-close, .login-modal .close"
+        rows_locator = (By.CSS_SELECTOR, "div.song-container")
         try:
-            modal_close_button = WebDriverWait(driver, 5).until(
-                EC.element_to_be_clickable((By.CSS_SELECTOR, ".modal-close-button, .modal-close, .login-modal .close"))
-            )
-            modal_close_button.click()
-            logging.info("Login modal closed.")
+            wait_until(driver, EC.any_of(
+                EC.element_to_be_clickable((By.CSS_SELECTOR, modal_selector)),
+                EC.presence_of_element_located(rows_locator)
+            ), 10, "988 login modal or chart rows")
+            if dismiss_modal(driver, modal_selector):
+                logging.info("Login modal closed.")
+            else:
+                logging.info("No login modal appeared.")
         except TimeoutException:
             logging.info("No login modal appeared.")
         except Exception as e:
             logging.warning(f"Unexpected error trying to close login modal: {e}")
 
         driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(3)
 
         try:
-            WebDriverWait(driver, 20).until(
-                EC.presence_of_all_elements_located((By.CSS_SELECTOR, "div.song-container"))
-            )
+            wait_until(driver, rows_stable(rows_locator), 20, "988 chart rows stable")
         except TimeoutException:
             logging.error("Timeout waiting for 988 chart items to load. The page may have changed.")
             driver.save_screenshot("debug_988_chart_timeout.png")
             with open("debug_988_page_source.html", "w", encoding="utf-8") as f:
                 f.write(driver.page_source)
-            driver.quit()
             return []
 
-        soup = BeautifulSoup(driver.page_source, "html.parser")
-        driver.quit()
+        return parse_rows(driver.page_source, STATION_SPECS["988"])
+
+
+def get_988_chart(pool=None):
+    try:
+        items, path = fetch_station_rows("988", lambda: fetch_988_rows_browser(pool))
+        logging.info(f"988 chart fetched via {path}.")
 
         chart_data = []
-        items = soup.select("div.song-container")
 
         if not items:
             logging.warning("No 988 chart items found on the page. Site structure may have changed.")
             return []
 
         for item in items[:20]:
-            rank_tag = item.select_one("p.ranking-text")
-            title_artist_tag = item.select_one("p.song-title.music-chart-song-title")
-            artist_tag = item.select_one("p.artist-name")
-
-            if not rank_tag or not title_artist_tag or not artist_tag:
+            if not item["rank"] or not item["title"] or not item["artist"]:
                 continue
 
             try:
-                rank = int(rank_tag.text.strip())
+                rank = int(item["rank"])
             except ValueError:
                 continue
 
-            full_title = title_artist_tag.text.strip()
-            artist = artist_tag.text.strip()
+            full_title = item["title"]
+            artist = item["artist"]
 
             if '｜' in full_title:
                 title, _ = full_title.split('｜', 1)
@@ -116,21 +113,22 @@ def get_988_chart():
         for entry in chart_data:
             logging.info(f"#{entry['rank']}: {entry['title']} by {entry['artist']} - {entry['spotify_link']}")
 
-        output_path = os.getenv('988_LOCATION')
-        if not output_path:
-            raise ValueError("Environment variable '988_LOCATION' is not set.")
-
-        filename = f"988_{datetime.now().strftime('%Y%m%d')}.json"
-        full_path = os.path.join(output_path, filename)
-        logging.info("Resolved full file path: %s", full_path)
+        fingerprint = chart_fingerprint(chart_data)
+        if is_unchanged("988", "write", fingerprint):
+            return chart_data
 
         try:
-            logging.info("Saving 988 chart data to JSON before writing...")
-            with open(full_path, 'w', encoding='utf-8') as f:
-                json.dump(chart_data, f, ensure_ascii=False, indent=2)
-            logging.info("988 chart data successfully written to: %s", full_path)
+            logging.info("Saving 988 chart snapshot...")
+            digest = save_snapshot("988", chart_data, source=path)
+            mark_done("988", "write", fingerprint)
+            logging.info("988 chart snapshot saved: %s", digest[:12])
         except Exception as fe:
-            logging.error("Failed to write file: %s", fe)
+            logging.error("Failed to save snapshot: %s", fe)
+        else:
+            try:
+                apply_snapshot("988")
+            except Exception as e:
+                logging.warning("Failed to update trend stats: %s", e)
 
         return chart_data
 
@@ -143,31 +141,21 @@ def get_988_chart():
     return chart_data
 
 
+# Rows annotated by chart_analytics.annotate_chart() show movement and peak
 def generate_blog_body(chart_data):
-    body = "<h2>988 音乐排行榜 - 每周更新</h2>"
-    body += f"<p>日期：{datetime.now().strftime('%Y-%m-%d')}</p>"
-    body += "<ol>"
-    for entry in chart_data:
-        body += f"<li><b>{entry['title']}</b> by {entry['artist']} - <a href='{entry['spotify_link']}'>Spotify</a></li>"
-    body += "</ol>"
-    return body
+    return render(chart_data, "list", theme="988", heading="988 音乐排行榜 - 每周更新",
+                  subheading=f"日期：{datetime.now().strftime('%Y-%m-%d')}")
+
+
+def blog_post(title, body_html):
+    client = get_client(os.getenv("BLOGGER_CLIENT_SECRET"), scopes=os.getenv("SCOPES").split(","),
+                        blog_id=os.getenv("BLOG_ID"))
+    return weekly_post(client, "988", title, body_html)
 
 
 def post_to_blogger(title, body_html):
-    creds = Credentials.from_authorized_user_file(
-        os.getenv("BLOGGER_CLIENT_SECRET"), scopes=os.getenv("SCOPES").split(",")
-    )
-    service = build('blogger', 'v3', credentials=creds)
-    blog_id = os.getenv("BLOG_ID")
-
-    post = {
-        "kind": "blogger#post",
-        "title": title,
-        "content": body_html
-    }
-
-    posts = service.posts()
-    result = posts.insert(blogId=blog_id, body=post, isDraft=False).execute()
+    client, job = blog_post(title, body_html)
+    result = client.upsert_post(job.key, job.title, job.content)
     logging.info(f"Blog post published: {result.get('url')}")
     return result
 
@@ -177,9 +165,9 @@ if __name__ == "__main__":
         print(json.dumps(chart, indent=2, ensure_ascii=False))
 
         try:
-            html_body = generate_blog_body(chart)
-            post_title = f"988 音乐排行榜 - 第 {datetime.now().strftime('%U')} 周"
-            post_to_blogger(post_title, html_body)
+            publish_if_changed("988", chart, lambda _: post_to_blogger(
+                f"988 音乐排行榜 - 第 {datetime.now().strftime('%U')} 周",
+                generate_blog_body(annotate_chart("988", chart))))
         except Exception as e:
             logging.error(f"Failed to post blog: {e}")
     else:
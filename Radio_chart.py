@@ -1,18 +1,21 @@
 # Radio Music Chart (radio_chart.py)
 import os
-import requests
-from bs4 import BeautifulSoup
 from urllib.parse import quote_plus
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
+
+from aggregate_chart import aggregate, frame_from_charts, rolling_chart
+from blogger_client import chart_week, get_client
+from change_detect import publish_if_changed
+from chart_render import render
+from chrome_pool import ChromePool, chrome_tab
+from dom_extract import extract_rows, STATION_SPECS
+from http_client import log_metrics
+from http_first import fetch_station_rows
+from page_ready import wait_until
 
 # Blogger settings
 load_dotenv()
@@ -21,107 +24,101 @@ BLOG_ID = os.getenv('BLOG_ID')
 TOKEN_FILE = 'token.json'
 SCOPES = ['https://www.googleapis.com/auth/blogger']
 
-# Step 1: Scrape Chart Data from MY FM using Selenium
-def fetch_myfm_chart():
+# Static HTML is tried first for every station; Chrome is only launched when
+# the rows are missing (see http_first.py)
+def chart_pairs(rows):
+    return [(row["title"], row["artist"]) for row in rows if row["title"] and row["artist"]]
+
+# Step 1: Scrape Chart Data from MY FM (browser fallback uses Selenium)
+def fetch_myfm_rows_browser(pool=None):
     url = 'https://my.syok.my/charts/my-fm-music-chart-2025'
 
-    options = Options()
-    options.add_argument('--headless')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.binary_location = "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"
+    with chrome_tab(pool, "myfm_list") as driver:
+        driver.get(url)
 
-    chrome_path = "/Users/macp/Documents/MUSIC_CHART/chromedriver_mac_arm64/chromedriver"
-    service = Service(chrome_path)
-    driver = webdriver.Chrome(service=service, options=options)
-    driver.get(url)
+        wait_until(driver, EC.presence_of_element_located((By.CLASS_NAME, "music-chart-list")), 30, "MY FM chart list")
 
-    try:
-        WebDriverWait(driver, 30).until(
-            EC.presence_of_element_located((By.CLASS_NAME, "music-chart-list"))
-        )
-
-        chart_items = []
-        rows = driver.find_elements(By.CSS_SELECTOR, ".music-chart-list li")
-        for row in rows:
-            try:
-                title = row.find_element(By.CLASS_NAME, "music-chart-song-title").text.strip()
-                artist = row.find_element(By.CLASS_NAME, "music-chart-song-artist").text.strip()
-                if title and artist:
-                    chart_items.append((title, artist))
-            except Exception:
-                continue
-
-        if not chart_items:
-            raise Exception("MY FM chart items not found or page structure has changed")
-
-        return chart_items
-    finally:
-        driver.quit()
+        return extract_rows(driver, STATION_SPECS["myfm_list"])
+
+def fetch_myfm_chart(pool=None):
+    rows, _ = fetch_station_rows("myfm_list", lambda: fetch_myfm_rows_browser(pool))
+    chart_items = chart_pairs(rows)
+
+    if not chart_items:
+        raise Exception("MY FM chart items not found or page structure has changed")
 
-# Step 2: Scrape Chart Data from 988
-def fetch_988_chart():
-    url = 'https://988.com.my/music_chart/'
-    res = requests.get(url)
-    soup = BeautifulSoup(res.content, 'html.parser')
-    chart_items = []
-    for row in soup.select(".music_chart_list .music_chart_content"):
-        song = row.select_one(".music_chart_title").get_text(strip=True)
-        artist = row.select_one(".music_chart_singer").get_text(strip=True)
-        chart_items.append((song, artist))
     return chart_items
 
+# Step 2: Scrape Chart Data from 988
+def fetch_988_chart(pool=None):
+    rows, _ = fetch_station_rows("988_list", pool=pool)
+    return chart_pairs(rows)
+
 # Step 3: Scrape Chart Data from EIGHT FM
-def fetch_eightfm_chart():
-    url = 'https://www.eight.audio/'
-    res = requests.get(url)
-    soup = BeautifulSoup(res.content, 'html.parser')
-    chart_items = []
-    for row in soup.select(".chart-card"):
-        song = row.select_one(".chart-card-title").get_text(strip=True)
-        artist = row.select_one(".chart-card-singer").get_text(strip=True)
-        chart_items.append((song, artist))
-    return chart_items
+def fetch_eightfm_chart(pool=None):
+    rows, _ = fetch_station_rows("eightfm_cards", pool=pool)
+    return chart_pairs(rows)
 
 # Step 4: Generate HTML with Spotify links
 def generate_html(title, chart_data):
-    html = f"<h2>{title} – {datetime.date.today()}</h2>\n<ol>"
-    for i, (song, artist) in enumerate(chart_data, 1):
-        search_query = quote_plus(f"{song} {artist}")
-        spotify_url = f"https://open.spotify.com/search/{search_query}"
-        html += f'<li><b>{song}</b> – {artist}<br><a href="{spotify_url}" target="_blank">Listen on Spotify</a></li>'
-    html += "</ol>"
-    return html
+    rows = [{"title": song, "artist": artist,
+             "spotify_link": f"https://open.spotify.com/search/{quote_plus(f'{song} {artist}')}"}
+            for song, artist in chart_data]
+    return render(rows, "list", theme="radio", heading=f"{title} – {datetime.date.today()}")
 
 # Step 5: Authenticate and Post to Blogger
 def authenticate_blogger():
-    creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
-    return build('blogger', 'v3', credentials=creds)
-
-def post_to_blogger(service, title, content):
-    body = {
-        "kind": "blogger#post",
-        "title": title,
-        "content": content
-    }
-    post = service.posts().insert(blogId=BLOG_ID, body=body, isDraft=False).execute()
+    return get_client(TOKEN_FILE, SCOPES, blog_id=BLOG_ID)
+
+def post_to_blogger(client, title, content, key):
+    post = client.upsert_post(key, title, content)
     print(f"Posted successfully: {post['url']}")
+    return post
+
+# Weekly chart with the rolling 4-week chart below it, as one post
+def publish_weekly(blogger, weekly):
+    name = "Malaysia Radio Chart"
+    html = generate_html(name, chart_pairs(weekly))
+    try:
+        rolling = rolling_chart()
+    except Exception as e:
+        print(f"Rolling chart unavailable: {e}")
+        rolling = []
+    if rolling:
+        html += generate_html(f"{name} (4 weeks)", chart_pairs(rolling))
+    return post_to_blogger(blogger, f"{name} – Chart Update", html, f"radio:malaysia:{chart_week()}")
 
 # Main function
+# The three station charts are merged into one Malaysia radio chart (see
+# aggregate_chart.py) and posted once, with the rolling 4-week chart below it.
 def main():
     blogger = authenticate_blogger()
 
-    myfm_chart = fetch_myfm_chart()
-    myfm_html = generate_html("MY FM Music 20", myfm_chart)
-    post_to_blogger(blogger, "MY FM Music 20 – Chart Update", myfm_html)
-
-    chart_988 = fetch_988_chart()
-    chart_988_html = generate_html("988 Music Chart", chart_988)
-    post_to_blogger(blogger, "988 Music Chart – Chart Update", chart_988_html)
-
-    eightfm_chart = fetch_eightfm_chart()
-    eightfm_html = generate_html("EIGHT FM 20好听榜", eightfm_chart)
-    post_to_blogger(blogger, "EIGHT FM 20好听榜 – Chart Update", eightfm_html)
+    # Scrape all three stations at once; total time is that of the slowest one.
+    # They share one Chrome pool: Chrome only starts for a station that needs
+    # the browser, and every instance is shut down once all three are done.
+    sources = [
+        ("myfm", fetch_myfm_chart),
+        ("988", fetch_988_chart),
+        ("eightfm", fetch_eightfm_chart),
+    ]
+    with ChromePool(size=len(sources)) as pool:
+        with ThreadPoolExecutor(max_workers=len(sources)) as executor:
+            futures = [executor.submit(fetch, pool) for _, fetch in sources]
+
+    charts = {}
+    for (station, _), future in zip(sources, futures):
+        try:
+            charts[station] = future.result()
+        except Exception as e:
+            print(f"Failed to fetch {station}: {e}")
+
+    weekly = aggregate(frame_from_charts(charts))
+    if not weekly:
+        print("No station charts fetched, nothing to post.")
+        return
+    publish_if_changed("radio:malaysia", weekly, lambda _: publish_weekly(blogger, weekly))
 
 if __name__ == '__main__':
     main()
+    log_metrics(print)
@@ -0,0 +1,138 @@
+# async_http.py
+# 以 asyncio + httpx 同時發出多個 GET 請求，取代逐首串行呼叫。
+#
+#   responses = get_all([(url, params, headers), ...])   # 同順序回傳
+#
+# - 每個主機有各自的並行上限（Semaphore）與速率上限（token bucket）
+# - 收到 429 時依 Retry-After 暫停「整個主機」後重試；5xx/連線錯誤則指數退避
+# - 回傳 httpx.Response（status_code / json() / text 與 requests 相同）
+# - 每次請求都記進 http_client 的主機統計，與同步請求一起報告
+
+import os
+import sys
+import asyncio
+import threading
+import time
+from urllib.parse import urlsplit
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from http_client import record
+
+# 主機 -> (最大並行數, 每秒請求數)
+HOST_LIMITS = {
+    "api.spotify.com": (8, 10.0),
+    "accounts.spotify.com": (2, 2.0),
+    "www.googleapis.com": (8, 10.0),
+}
+DEFAULT_LIMIT = (4, 5.0)
+MAX_RETRIES = 3
+TIMEOUT = httpx.Timeout(15.0, connect=5.0)
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    # 回傳需要等待的秒數；0 代表已取得 token
+    def _take(self):
+        with self._lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return self.paused_until - now
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        while True:
+            wait = self._take()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    # 429：整個主機暫停到 Retry-After 之後
+    def pause(self, seconds):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+# token bucket 跨呼叫共用，同一程序內的速率限制才會一致
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def bucket_for(host):
+    with _buckets_lock:
+        if host not in _buckets:
+            _buckets[host] = TokenBucket(HOST_LIMITS.get(host, DEFAULT_LIMIT)[1])
+        return _buckets[host]
+
+
+def retry_after(resp, attempt):
+    value = resp.headers.get("Retry-After")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 2 ** attempt
+
+
+class AsyncHTTP:
+    def __init__(self, client):
+        self.client = client
+        self._semaphores = {}
+
+    def _semaphore(self, host):
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(HOST_LIMITS.get(host, DEFAULT_LIMIT)[0])
+        return self._semaphores[host]
+
+    async def get(self, url, params=None, headers=None):
+        host = urlsplit(url).hostname
+        bucket = bucket_for(host)
+        async with self._semaphore(host):
+            for attempt in range(MAX_RETRIES + 1):
+                await bucket.acquire()
+                started = time.perf_counter()
+                try:
+                    resp = await self.client.get(url, params=params, headers=headers)
+                    record(host, time.perf_counter() - started, len(resp.content), resp.status_code)
+                except httpx.TransportError as e:
+                    record(host, time.perf_counter() - started, error=True)
+                    if attempt == MAX_RETRIES:
+                        raise
+                    print(f"⚠ 連線錯誤（{host}）：{e}，{2 ** attempt} 秒後重試")
+                    await asyncio.sleep(2 ** attempt)
+                    continue
+                if resp.status_code == 429 and attempt < MAX_RETRIES:
+                    wait = retry_after(resp, attempt)
+                    print(f"⏳ {host} 回應 429，{wait:.0f} 秒後重試")
+                    bucket.pause(wait)
+                    continue
+                if resp.status_code >= 500 and attempt < MAX_RETRIES:
+                    await asyncio.sleep(2 ** attempt)
+                    continue
+                return resp
+
+
+async def _get_all(requests_list):
+    async with httpx.AsyncClient(timeout=TIMEOUT) as client:
+        http = AsyncHTTP(client)
+        return await asyncio.gather(*(http.get(url, params, headers) for url, params, headers in requests_list),
+                                    return_exceptions=True)
+
+
+# requests_list: [(url, params, headers)]；失敗的請求回傳 Exception 物件
+def get_all(requests_list):
+    if not requests_list:
+        return []
+    return asyncio.run(_get_all(list(requests_list)))
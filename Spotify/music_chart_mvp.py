@@ -1,17 +1,27 @@
 # music_chart_mvp.py
 # MVP: 自動建立歌曲排行榜，生成 HTML，並自動發佈到 Blogger（含 AI 解說段落）
 
-import requests
+import sys
 import pandas as pd
 import urllib.parse
 from dotenv import load_dotenv
 import os
 import json
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from io import StringIO
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import http_client
+from chart_render import Column, esc, render
+from blogger_client import PostJob, chart_week, get_client
+import spotify_cache
+from spotify_cache import cache_key
+import youtube_enrich
+from spotify_enrich import enrich_popularity
+from spotify_playlist import PlaylistUnavailable, iter_playlist_tracks
+from spotify_token import SpotifyTokenManager
+from youtube_enrich import enrich_views
 
 # === 載入環境變數 ===
 load_dotenv()
@@ -36,23 +46,16 @@ REGION_NAMES = {
 os.makedirs("logs", exist_ok=True)
 os.makedirs("logs/raw", exist_ok=True)
 
-# === Spotify 授權 ===
+# === Spotify 授權（token 由 spotify_token.py 快取，所有地區共用） ===
+token_manager = SpotifyTokenManager(SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET)
+
 def get_spotify_token():
-    resp = requests.post("https://accounts.spotify.com/api/token",
-        data={"grant_type": "client_credentials"},
-        auth=(SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET))
-    if resp.status_code != 200:
-        print(f"⚠ 無法取得 Spotify token：{resp.status_code} - {resp.text}")
-        return None
-    token = resp.json().get("access_token")
-    print(f"🎫 成功取得 Spotify token: {token[:10]}...")
-    return token
+    return token_manager.get()
 
 # === 播放清單搜尋 API ===
-def search_playlist(query, token):
+def search_playlist(query, tokens):
     url = f"https://api.spotify.com/v1/search?q={urllib.parse.quote(query)}&type=playlist&limit=1"
-    headers = {"Authorization": f"Bearer {token}"}
-    resp = requests.get(url, headers=headers)
+    resp = tokens.api_get(url)
     if resp.status_code != 200:
         print(f"⚠ 搜尋播放清單失敗：{resp.status_code} - {resp.text}")
         return None
@@ -70,79 +73,45 @@ def fetch_spotify_top_playlist(region="my", limit=10):
         return []
 
     query_name = f"Top 50 - {region.upper()}"
-    playlist_id = search_playlist(query_name, token)
+    playlist_id = search_playlist(query_name, token_manager)
     if not playlist_id:
         print(f"🔁 嘗試 fallback 至 Top 50 - Global")
-        playlist_id = search_playlist("Top 50 - Global", token)
+        playlist_id = search_playlist("Top 50 - Global", token_manager)
     if not playlist_id:
         print("❌ 找不到有效播放清單 ID")
         return []
 
-    url = f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks?limit={limit}&fields=items(track(name,artists(name)))"
-    headers = {"Authorization": f"Bearer {token}"}
-    resp = requests.get(url, headers=headers)
-    print(f"📡 呼叫 Spotify 播放清單 API：{resp.status_code}")
-
-    if resp.status_code != 200:
-        print(f"⚠ 無法下載播放清單（{region}）: HTTP {resp.status_code}")
-        print(f"⚠ 錯誤內容：{resp.text[:300]}")
-        return []
-
+    raw_path = f"logs/raw/spotify_raw_{region}.jsonl"
+    songs = []
     try:
-        data = resp.json()
-    except Exception as e:
-        print(f"⚠ JSON 解碼失敗：{e}")
-        print(resp.text[:500])
+        with open(raw_path, "w", encoding="utf-8") as raw:
+            for track in iter_playlist_tracks(playlist_id, token_manager, limit=limit):
+                raw.write(json.dumps(track, ensure_ascii=False) + "\n")
+                name = track["name"]
+                artists = ", ".join(track["artists"])
+                if name and artists:
+                    songs.append({
+                        "歌曲名稱": name,
+                        "歌手": artists,
+                        "track_id": track["id"],
+                        "Spotify熱度": track["popularity"],
+                        "Spotify網址": track["url"],
+                    })
+    except PlaylistUnavailable as e:
+        print(f"⚠ 無法下載播放清單（{region}）: {e}")
         return []
 
-    debug_file = f"logs/raw/spotify_raw_{region}.json"
-    with open(debug_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"📝 原始 JSON 已儲存：{debug_file}")
-
-    items = data.get("items", [])
-    print(f"🔎 播放清單取得成功：{len(items)} 首")
-
-    songs = []
-    for item in items:
-        track = item.get("track")
-        if track is None:
-            continue
-        name = track.get("name", "")
-        artists = ", ".join([artist.get("name", "") for artist in track.get("artists", [])])
-        if name and artists:
-            songs.append({"歌曲名稱": name, "歌手": artists})
-
+    print(f"📝 原始資料已儲存：{raw_path}")
+    print(f"🔎 播放清單取得成功：{len(songs)} 首")
     return songs
 
-# === 查 Spotify 熱度 ===
-def fetch_spotify_popularity(song, artist, token):
-    query = urllib.parse.quote(f"track:{song} artist:{artist}")
-    url = f"https://api.spotify.com/v1/search?q={query}&type=track&limit=1"
-    headers = {"Authorization": f"Bearer {token}"}
-    resp = requests.get(url, headers=headers)
-    items = resp.json().get("tracks", {}).get("items", [])
-    if items:
-        return items[0].get("popularity", 0)
-    return 0
-
-# === 查 YouTube 播放量 ===
+# === 查 Spotify 熱度（單首；整份榜單請用 spotify_enrich.enrich_popularity） ===
+def fetch_spotify_popularity(song, artist, cache=None):
+    return enrich_popularity([{"song": song, "artist": artist}], token_manager, cache)[0]["popularity"]
+
+# === 查 YouTube 播放量（單首；整份榜單請用 youtube_enrich.enrich_views） ===
 def fetch_youtube_views(song, artist):
-    query = urllib.parse.quote(f"{song} {artist}")
-    search_url = f"https://www.googleapis.com/youtube/v3/search?part=snippet&q={query}&key={YOUTUBE_API_KEY}&maxResults=1&type=video"
-    resp = requests.get(search_url).json()
-    items = resp.get("items", [])
-    if not items:
-        return 0
-    video_id = items[0].get("id", {}).get("videoId")
-    if not video_id:
-        return 0
-    stat_url = f"https://www.googleapis.com/youtube/v3/videos?part=statistics&id={video_id}&key={YOUTUBE_API_KEY}"
-    stats = requests.get(stat_url).json()
-    if "items" not in stats or not stats["items"]:
-        return 0
-    views = stats["items"][0]["statistics"].get("viewCount", 0)
-    return int(views)
+    return enrich_views([(song, artist)], YOUTUBE_API_KEY)[0]
 
 # === 整合資料與排序 ===
 def build_chart(source="top50", region="my"):
@@ -152,11 +121,26 @@ def build_chart(source="top50", region="my"):
     songs = fetch_spotify_top_playlist(region=region, limit=10)
     if not songs:
         return pd.DataFrame()
+    enriched, views = enrich_songs(songs)
+    return score_chart(songs, enriched, views)
 
+# Spotify 與 YouTube 兩個階段同時進行，各自的請求再由 async_http 並行送出
+#  - Spotify：整份榜單一次補齊熱度（已知 ID 的歌曲批次查詢）
+#  - YouTube：videoId 快取 + 每 50 部一次 stats 查詢，配額不足時用舊播放量
+def enrich_songs(songs):
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        spotify_job = executor.submit(enrich_popularity, [
+            {"song": song['歌曲名稱'], "artist": song['歌手'], "track_id": song.get('track_id'),
+             "popularity": song.get('Spotify熱度'), "url": song.get('Spotify網址')}
+            for song in songs
+        ], token_manager)
+        youtube_job = executor.submit(enrich_views, [(song['歌曲名稱'], song['歌手']) for song in songs], YOUTUBE_API_KEY)
+        return spotify_job.result(), youtube_job.result()
+
+def score_chart(songs, enriched, views):
     chart = []
-    for song in songs:
-        yt_views = fetch_youtube_views(song['歌曲名稱'], song['歌手'])
-        spotify_pop = fetch_spotify_popularity(song['歌曲名稱'], song['歌手'], token)
+    for song, spotify, yt_views in zip(songs, enriched, views):
+        spotify_pop = spotify["popularity"]
         score = (yt_views / 1000) * 0.5 + spotify_pop * 0.5
         chart.append({
             "歌曲": song['歌曲名稱'],
@@ -171,38 +155,82 @@ def build_chart(source="top50", region="my"):
     df["排名"] = df["總分"].rank(ascending=False, method="min").astype(int)
     return df.sort_values("排名")
 
+# === 多地區同時建立排行榜 ===
+# 各地區的播放清單同時下載；多個地區共有的歌曲只補齊一次資料
+# （token、HTTP session、快取本來就是整個程序共用）。
+def song_key(song):
+    return song.get('track_id') or cache_key(song['歌曲名稱'], song['歌手'])
+
+def build_all_charts(regions, workers=None):
+    token = get_spotify_token()
+    if not token:
+        return {}
+    with ThreadPoolExecutor(max_workers=workers or len(regions)) as executor:
+        playlists = dict(zip(regions, executor.map(lambda r: fetch_spotify_top_playlist(region=r, limit=10), regions)))
+
+    unique = {}
+    for songs in playlists.values():
+        for song in songs:
+            unique.setdefault(song_key(song), song)
+    total = sum(len(songs) for songs in playlists.values())
+    print(f"🧮 {len(regions)} 個地區共 {total} 首，去重後 {len(unique)} 首需要補齊資料")
+
+    enriched, views = enrich_songs(list(unique.values()))
+    enrichment = dict(zip(unique, zip(enriched, views)))
+
+    charts = {}
+    for region, songs in playlists.items():
+        if not songs:
+            charts[region] = pd.DataFrame()
+            continue
+        charts[region] = score_chart(songs, [enrichment[song_key(s)][0] for s in songs],
+                                     [enrichment[song_key(s)][1] for s in songs])
+    return charts
+
+# 表格欄位：(表頭, DataFrame 欄位)
+CHART_COLUMNS = [
+    Column("排名", "排名"),
+    Column("歌曲", "歌曲"),
+    Column("歌手", "歌手"),
+    Column("YT 播放", "YT播放量"),
+    Column("Spotify 熱度", "Spotify熱度"),
+    Column("總分", "總分"),
+    Column("Spotify", "Spotify連結", link=True),
+]
+
 # === 產生 HTML 表格 ===
 def generate_html_table(df):
-    html = '<table border="1" cellpadding="6" cellspacing="0" style="border-collapse:collapse; width:100%; font-family:sans-serif;">'
-    html += '<thead><tr style="background-color:#f2f2f2;"><th>排名</th><th>歌曲</th><th>歌手</th><th>YT 播放</th><th>Spotify 熱度</th><th>總分</th><th>Spotify</th></tr></thead><tbody>'
-    for _, row in df.iterrows():
-        html += f"<tr><td>{row['排名']}</td><td>{row['歌曲']}</td><td>{row['歌手']}</td><td>{row['YT播放量']}</td><td>{row['Spotify熱度']}</td><td>{row['總分']}</td><td><a href='{row['Spotify連結']}' target='_blank'>🎵</a></td></tr>"
-    html += '</tbody></table>'
-    return html
+    return render(df.to_dict("records"), "table", theme="spotify", columns=CHART_COLUMNS)
 
 # === 發佈至 Blogger（修正結構） ===
-def publish_to_blogger(content_html, region):
-    creds = None
-    if os.path.exists(TOKEN_PATH):
-        creds = Credentials.from_authorized_user_file(TOKEN_PATH, ['https://www.googleapis.com/auth/blogger'])
-    else:
-        flow = InstalledAppFlow.from_client_secrets_file(BLOGGER_CLIENT_SECRET, scopes=['https://www.googleapis.com/auth/blogger'])
-        creds = flow.run_local_server(port=8080)
-        with open(TOKEN_PATH, 'w') as token:
-            token.write(creds.to_json())
-
-    service = build('blogger', 'v3', credentials=creds)
+def blogger_client():
+    # 整個程序共用同一個 Blogger client（見 blogger_client.py）
+    return get_client(TOKEN_PATH, client_secret=BLOGGER_CLIENT_SECRET, blog_id=BLOG_ID)
+
+def post_job(content_html, region):
     region_name = REGION_NAMES.get(region, region.upper())
     title = f"每週歌曲數據榜（{region_name}）"
+    return PostJob(f"spotify:{region}:{chart_week()}", title, content_html)
 
-    body = {
-        "title": title,
-        "content": content_html
-    }
-
-    post = service.posts().insert(blogId=BLOG_ID, body=body, isDraft=False).execute()
+def publish_to_blogger(content_html, region):
+    job = post_job(content_html, region)
+    post = blogger_client().upsert_post(job.key, job.title, job.content)
     print(f"✅ 已發佈：{post['title']}")
 
+# 一次送出所有地區的文章（單一 batch 請求，逐篇回報結果）
+def publish_all_to_blogger(contents):
+    jobs = {region: post_job(html, region) for region, html in contents.items()}
+    results = blogger_client().publish_many(list(jobs.values()))
+    for region, job in jobs.items():
+        result = results[job.key]
+        if result.error:
+            print(f"⚠ {region.upper()} 發佈失敗：{result.error}")
+        elif result.post.get("skipped"):
+            print(f"⏭ 內容未變更，略過：{job.title}")
+        else:
+            print(f"✅ 已發佈：{result.post['title']}")
+    return results
+
 # === AI 解說生成（簡化） ===
 def generate_ai_summary(df):
     top3 = df.head(3)
@@ -211,14 +239,18 @@ def generate_ai_summary(df):
 
 # === 主程式 ===
 if __name__ == "__main__":
-    regions = ["my", "sg", "ph", "id"]
-    for region in regions:
-        print(f"🔄 產生 {region.upper()} 排行榜...")
-        df = build_chart(region=region)
+    regions = list(REGION_NAMES)
+    print(f"🔄 同時產生 {', '.join(r.upper() for r in regions)} 排行榜...")
+    charts = build_all_charts(regions)
+    contents = {}
+    for region, df in charts.items():
         if df.empty:
-            print("⚠ 無法建立排行榜，來源資料為空或失敗。")
+            print(f"⚠ {region.upper()} 無法建立排行榜，來源資料為空或失敗。")
             continue
         html_table = generate_html_table(df)
         summary = generate_ai_summary(df)
-        full_content = f"<p>{summary}</p>{html_table}"
-        publish_to_blogger(full_content, region)
+        contents[region] = f"<p>{esc(summary)}</p>{html_table}"
+    publish_all_to_blogger(contents)
+    spotify_cache.default_cache().report()
+    http_client.log_metrics(print)
+    youtube_enrich.default_cache().report()
@@ -1,17 +1,22 @@
 # music_chart_mvp.py
 # MVP: 自動建立歌曲排行榜，生成 HTML，並自動發佈到 Blogger（含 AI 解說段落）
 
-import requests
+import sys
 import pandas as pd
 import urllib.parse
 from dotenv import load_dotenv
 import os
 import json
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from io import StringIO
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import http_client
+from chart_render import Column, esc, render
+from blogger_client import PostJob, chart_week, get_client
+from spotify_playlist import PlaylistUnavailable, iter_playlist_tracks
+from spotify_token import SpotifyTokenManager
 
 # === 載入環境變數 ===
 load_dotenv()
@@ -45,27 +50,21 @@ REGION_PLAYLISTS = {
 os.makedirs("logs", exist_ok=True)
 os.makedirs("logs/raw", exist_ok=True)
 
-# === Spotify 授權 ===
+# === Spotify 授權（token 由 spotify_token.py 快取，所有地區共用） ===
+token_manager = SpotifyTokenManager(SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET)
+
 def get_spotify_token():
-    resp = requests.post("https://accounts.spotify.com/api/token",
-        data={"grant_type": "client_credentials"},
-        auth=(SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET))
-    if resp.status_code != 200:
-        print(f"⚠ 無法取得 Spotify token：{resp.status_code} - {resp.text}")
-        return None
-    token = resp.json().get("access_token")
-    print(f"🎫 成功取得 Spotify token: {token[:10]}...")
-    return token
+    return token_manager.get()
 
 # === 使用 Spotify Charts CSV 下載 URL ===
 def fetch_spotify_charts_csv(region="my", period="weekly", date="latest"):
     base_url = f"https://spotifycharts.com/regional/{region}/{period}/{date}/download"
     try:
-        response = requests.get(base_url, allow_redirects=False)
+        response = http_client.get(base_url, allow_redirects=False)
         if response.status_code in [301, 302] and 'Location' in response.headers:
             redirect_url = response.headers['Location']
             print(f"🔁 發現重新導向至：{redirect_url}")
-            response = requests.get(redirect_url)
+            response = http_client.get(redirect_url)
         elif response.status_code == 200:
             print(f"📡 成功下載排行榜 CSV：{region}-{period}")
         else:
@@ -97,53 +96,47 @@ def fetch_spotify_charts_csv(region="my", period="weekly", date="latest"):
         print(f"⚠ 發生錯誤：{e}")
         return None
 
-# === 使用 Spotify 播放清單 API 作為備援（新的完整 playlist endpoint） ===
-def fetch_spotify_playlist_backup(region="my"):
-    playlist_id = REGION_PLAYLISTS.get(region)
+# === 使用 Spotify 播放清單 API 作為備援（逐頁讀取，只取需要的欄位） ===
+# playlist_region：實際讀取的播放清單地區（改用 global 時），原始資料仍存到 region 的檔案
+def fetch_spotify_playlist_backup(region="my", playlist_region=None):
+    playlist_region = playlist_region or region
+    playlist_id = REGION_PLAYLISTS.get(playlist_region)
     if not playlist_id:
-        print(f"⚠ 無對應播放清單 ID：{region}")
+        print(f"⚠ 無對應播放清單 ID：{playlist_region}")
         return None
 
     token = get_spotify_token()
     if not token:
         return None
 
-    headers = {"Authorization": f"Bearer {token}"}
-    url = f"https://api.spotify.com/v1/playlists/{playlist_id}"
-    resp = requests.get(url, headers=headers)
-    print(f"📡 呼叫 Spotify 播放清單 API：{resp.status_code}")
-
-    if resp.status_code != 200:
-        if region != "global":
+    # 原始資料逐行寫入 JSON Lines，不必先把整份播放清單留在記憶體
+    raw_path = f"logs/raw/spotify_raw_{region}.jsonl"
+    rows = []
+    try:
+        with open(raw_path, "w", encoding="utf-8") as raw:
+            for track in iter_playlist_tracks(playlist_id, token_manager):
+                raw.write(json.dumps(track, ensure_ascii=False) + "\n")
+                name = track["name"]
+                artist = track["artists"][0] if track["artists"] else None
+                popularity = track["popularity"] or 0
+                if name and artist:
+                    rows.append({
+                        "排名": track["rank"],
+                        "歌曲": name,
+                        "歌手": artist,
+                        "Spotify熱度": popularity,
+                        "總分": popularity,
+                        "Spotify連結": track["url"]
+                    })
+    except PlaylistUnavailable as e:
+        print(f"📡 呼叫 Spotify 播放清單 API：{e.status_code}")
+        if playlist_region != "global":
             print("🔁 嘗試改用 global 播放清單")
-            return fetch_spotify_playlist_backup(region="global")
-        print(f"⚠ 無法下載播放清單（{region}）: HTTP {resp.status_code}")
-        print(f"⚠ 錯誤內容：{resp.text}")
+            return fetch_spotify_playlist_backup(region, playlist_region="global")
+        print(f"⚠ 無法下載播放清單（{playlist_region}）: {e}")
         return None
 
-    data = resp.json()
-    raw_path = f"logs/raw/spotify_raw_{region}.json"
-    with open(raw_path, "w") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-        print(f"📝 原始 JSON 已儲存：{raw_path}")
-
-    items = data.get("tracks", {}).get("items", [])
-    rows = []
-    for idx, item in enumerate(items, 1):
-        track = item.get("track", {})
-        name = track.get("name")
-        artist = track.get("artists", [{}])[0].get("name")
-        popularity = track.get("popularity", 0)
-        url = track.get("external_urls", {}).get("spotify")
-        if name and artist:
-            rows.append({
-                "排名": idx,
-                "歌曲": name,
-                "歌手": artist,
-                "Spotify熱度": popularity,
-                "總分": popularity,
-                "Spotify連結": url
-            })
+    print(f"📝 原始資料已儲存：{raw_path}")
     df = pd.DataFrame(rows)
     print(f"🔎 播放清單取得成功：{len(df)} 首")
     return df
@@ -161,38 +154,49 @@ def build_chart(source="charts", region="my"):
     df["排名"] = df["總分"].rank(ascending=False, method="min").astype(int)
     return df.sort_values("排名")
 
+# 表格欄位：(表頭, DataFrame 欄位)
+CHART_COLUMNS = [
+    Column("排名", "排名"),
+    Column("歌曲", "歌曲"),
+    Column("歌手", "歌手"),
+    Column("Spotify 熱度", "Spotify熱度"),
+    Column("總分", "總分"),
+    Column("Spotify", "Spotify連結", link=True),
+]
+
 # === 產生 HTML 表格 ===
 def generate_html_table(df):
-    html = '<table border="1" cellpadding="6" cellspacing="0" style="border-collapse:collapse; width:100%; font-family:sans-serif;">'
-    html += '<thead><tr style="background-color:#f2f2f2;"><th>排名</th><th>歌曲</th><th>歌手</th><th>Spotify 熱度</th><th>總分</th><th>Spotify</th></tr></thead><tbody>'
-    for _, row in df.iterrows():
-        html += f"<tr><td>{row['排名']}</td><td>{row['歌曲']}</td><td>{row['歌手']}</td><td>{row['Spotify熱度']}</td><td>{row['總分']}</td><td><a href='{row['Spotify連結']}' target='_blank'>🎵</a></td></tr>"
-    html += '</tbody></table>'
-    return html
+    return render(df.to_dict("records"), "table", theme="spotify", columns=CHART_COLUMNS)
 
 # === 發佈至 Blogger ===
-def publish_to_blogger(content_html, region):
-    creds = None
-    if os.path.exists(TOKEN_PATH):
-        creds = Credentials.from_authorized_user_file(TOKEN_PATH, ['https://www.googleapis.com/auth/blogger'])
-    else:
-        flow = InstalledAppFlow.from_client_secrets_file(BLOGGER_CLIENT_SECRET, scopes=['https://www.googleapis.com/auth/blogger'])
-        creds = flow.run_local_server(port=8080)
-        with open(TOKEN_PATH, 'w') as token:
-            token.write(creds.to_json())
-
-    service = build('blogger', 'v3', credentials=creds)
+def blogger_client():
+    # 整個程序共用同一個 Blogger client（見 blogger_client.py）
+    return get_client(TOKEN_PATH, client_secret=BLOGGER_CLIENT_SECRET, blog_id=BLOG_ID)
+
+def post_job(content_html, region):
     region_name = REGION_NAMES.get(region, region.upper())
     title = f"每週歌曲數據榜（{region_name}）"
+    return PostJob(f"spotify-charts:{region}:{chart_week()}", title, content_html)
 
-    body = {
-        "title": title,
-        "content": content_html
-    }
-
-    post = service.posts().insert(blogId=BLOG_ID, body=body, isDraft=False).execute()
+def publish_to_blogger(content_html, region):
+    job = post_job(content_html, region)
+    post = blogger_client().upsert_post(job.key, job.title, job.content)
     print(f"✅ 已發佈：{post['title']}")
 
+# 一次送出所有地區的文章（單一 batch 請求，逐篇回報結果）
+def publish_all_to_blogger(contents):
+    jobs = {region: post_job(html, region) for region, html in contents.items()}
+    results = blogger_client().publish_many(list(jobs.values()))
+    for region, job in jobs.items():
+        result = results[job.key]
+        if result.error:
+            print(f"⚠ {region.upper()} 發佈失敗：{result.error}")
+        elif result.post.get("skipped"):
+            print(f"⏭ 內容未變更，略過：{job.title}")
+        else:
+            print(f"✅ 已發佈：{result.post['title']}")
+    return results
+
 # === AI 解說生成 ===
 def generate_ai_summary(df):
     top3 = df.head(3)
@@ -201,14 +205,19 @@ def generate_ai_summary(df):
 
 # === 主程式 ===
 if __name__ == "__main__":
-    regions = ["my", "sg", "ph", "id"]
-    for region in regions:
-        print(f"🔄 產生 {region.upper()} 排行榜...")
-        df = build_chart(region=region)
+    # 有播放清單的地區都產生排行榜（global 只作為備援來源）
+    regions = [region for region in REGION_PLAYLISTS if region != "global"]
+    # 各地區同時下載（共用 token 與 HTTP session），再一次批次發佈
+    print(f"🔄 同時產生 {', '.join(r.upper() for r in regions)} 排行榜...")
+    with ThreadPoolExecutor(max_workers=len(regions)) as executor:
+        charts = dict(zip(regions, executor.map(lambda r: build_chart(region=r), regions)))
+    contents = {}
+    for region, df in charts.items():
         if df.empty:
-            print(f"⚠ 無法建立排行榜，來源資料為空或失敗。")
+            print(f"⚠ {region.upper()} 無法建立排行榜，來源資料為空或失敗。")
             continue
         html_table = generate_html_table(df)
         summary = generate_ai_summary(df)
-        full_content = f"<p>{summary}</p>{html_table}"
-        publish_to_blogger(full_content, region)
+        contents[region] = f"<p>{esc(summary)}</p>{html_table}"
+    publish_all_to_blogger(contents)
+    http_client.log_metrics(print)
@@ -0,0 +1,133 @@
+# spotify_cache.py
+# Spotify 查詢結果的本地快取（SQLite），避免每週重複搜尋相同的歌曲。
+#
+# 以正規化的（歌曲, 歌手）為 key，存 track ID、連結與熱度：
+#   - track ID / 連結（identity）幾乎不變，TTL 較長（預設 30 天）
+#   - 熱度（popularity）每天都會變，TTL 較短（預設 1 天）
+#   - 超過 SPOTIFY_CACHE_MAX 筆時，刪除最久未使用的資料（LRU）
+# 熱度過期但 track ID 仍有效時，只需用 ID 查熱度，不必再搜尋。
+
+import os
+import sys
+import time
+import sqlite3
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from song_identity import song_keys_for
+
+CACHE_PATH = os.getenv("SPOTIFY_CACHE_PATH", "logs/spotify_cache.db")
+IDENTITY_TTL = float(os.getenv("SPOTIFY_IDENTITY_TTL_DAYS", "30")) * 86400
+POPULARITY_TTL = float(os.getenv("SPOTIFY_POPULARITY_TTL_HOURS", "24")) * 3600
+MAX_ENTRIES = int(os.getenv("SPOTIFY_CACHE_MAX", "5000"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS spotify_lookup (
+    cache_key     TEXT PRIMARY KEY,
+    song          TEXT NOT NULL,
+    artist        TEXT NOT NULL,
+    track_id      TEXT,
+    url           TEXT,
+    popularity    INTEGER,
+    identity_at   REAL NOT NULL,
+    popularity_at REAL,
+    last_used     REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS spotify_lookup_lru ON spotify_lookup (last_used);
+"""
+
+
+# 與電台榜共用 song_identity 的正規化（繁簡、feat.、空白…）
+def cache_key(song, artist):
+    return song_keys_for(song, artist)[2]
+
+
+class SpotifyCache:
+    def __init__(self, path=None, identity_ttl=IDENTITY_TTL, popularity_ttl=POPULARITY_TTL, max_entries=MAX_ENTRIES):
+        self.path = path or CACHE_PATH
+        self.identity_ttl = identity_ttl
+        self.popularity_ttl = popularity_ttl
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "stale": 0, "misses": 0, "writes": 0, "evicted": 0}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    # 回傳 (entry, 狀態)：狀態為 "hit"（全部有效）、"stale"（只有熱度過期）或 "miss"
+    def lookup(self, song, artist):
+        key = cache_key(song, artist)
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM spotify_lookup WHERE cache_key = ?", (key,)).fetchone()
+            if row is None or now - row["identity_at"] > self.identity_ttl:
+                self.stats["misses"] += 1
+                return None, "miss"
+            with self.conn:
+                self.conn.execute("UPDATE spotify_lookup SET last_used = ? WHERE cache_key = ?", (now, key))
+            entry = dict(row)
+            # 搜尋不到的歌曲也會快取，但只保留熱度 TTL 的時間
+            if row["popularity_at"] is not None and now - row["popularity_at"] <= self.popularity_ttl:
+                self.stats["hits"] += 1
+                return entry, "hit"
+            if row["track_id"] is None:
+                self.stats["misses"] += 1
+                return None, "miss"
+            self.stats["stale"] += 1
+            return entry, "stale"
+
+    def put(self, song, artist, track_id=None, url=None, popularity=None):
+        key = cache_key(song, artist)
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO spotify_lookup "
+                "(cache_key, song, artist, track_id, url, popularity, identity_at, popularity_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, song, artist, track_id, url, popularity, now, now, now)
+            )
+            self.stats["writes"] += 1
+            self._evict()
+
+    # 只更新熱度（track ID 沿用），用於 stale 的資料
+    def update_popularity(self, song, artist, popularity):
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE spotify_lookup SET popularity = ?, popularity_at = ?, last_used = ? WHERE cache_key = ?",
+                (popularity, now, now, cache_key(song, artist))
+            )
+            self.stats["writes"] += 1
+
+    def _evict(self):
+        over = self.conn.execute("SELECT COUNT(*) FROM spotify_lookup").fetchone()[0] - self.max_entries
+        if over > 0:
+            self.conn.execute(
+                "DELETE FROM spotify_lookup WHERE cache_key IN "
+                "(SELECT cache_key FROM spotify_lookup ORDER BY last_used LIMIT ?)", (over,)
+            )
+            self.stats["evicted"] += over
+
+    def hit_rate(self):
+        total = self.stats["hits"] + self.stats["stale"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
+
+    def report(self):
+        s = self.stats
+        print(f"📊 Spotify 快取：命中 {s['hits']}、熱度過期 {s['stale']}、未命中 {s['misses']}、"
+              f"寫入 {s['writes']}、淘汰 {s['evicted']}（命中率 {self.hit_rate():.0%}）")
+
+    def close(self):
+        self.conn.close()
+
+
+_default_cache = None
+
+
+def default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = SpotifyCache()
+    return _default_cache
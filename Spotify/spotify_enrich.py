@@ -0,0 +1,108 @@
+# spotify_enrich.py
+# 批次補齊歌曲的 Spotify track ID、連結與熱度。
+#
+# 每首歌依序嘗試：
+#   1. 播放清單回應已附熱度 → 直接使用（0 次請求）
+#   2. 本地快取有效 → 直接使用（0 次請求）
+#   3. 已知 track ID（來自播放清單或快取）→ 以 /v1/tracks?ids= 每 50 首一次批次查詢
+#   4. 完全沒有 ID → 才用 /v1/search 逐首搜尋
+# 每個地區約 N/50 次請求，而不是每首歌一次搜尋。
+# 批次查詢與搜尋都透過 async_http 同時送出（tokens.api_get_all，401 時換新 token 重試）。
+
+from spotify_cache import default_cache
+
+TRACKS_URL = "https://api.spotify.com/v1/tracks"
+SEARCH_URL = "https://api.spotify.com/v1/search"
+BATCH_SIZE = 50
+
+
+def track_fields(track):
+    return {
+        "track_id": track.get("id"),
+        "url": track.get("external_urls", {}).get("spotify"),
+        "popularity": track.get("popularity", 0),
+    }
+
+
+# 以 track ID 批次查詢，回傳 {track_id: track}
+def fetch_tracks(track_ids, tokens):
+    tracks = {}
+    ids = list(dict.fromkeys(track_ids))
+    batches = [ids[start:start + BATCH_SIZE] for start in range(0, len(ids), BATCH_SIZE)]
+    responses = tokens.api_get_all([(TRACKS_URL, {"ids": ",".join(batch)}) for batch in batches])
+    for resp in responses:
+        if isinstance(resp, Exception) or resp.status_code != 200:
+            print(f"⚠ 批次查詢曲目失敗：{resp if isinstance(resp, Exception) else resp.status_code}")
+            continue
+        for track in resp.json().get("tracks", []):
+            if track:
+                tracks[track["id"]] = track
+    return tracks
+
+
+def search_params(song, artist):
+    return {"q": f"track:{song} artist:{artist}", "type": "track", "limit": 1}
+
+
+# 回傳 (track 或 None, 是否為有效回應)
+def parse_search(resp, song, artist):
+    if isinstance(resp, Exception) or resp.status_code != 200:
+        print(f"⚠ Spotify 搜尋失敗：{resp if isinstance(resp, Exception) else resp.status_code} - {song} / {artist}")
+        return None, False
+    items = resp.json().get("tracks", {}).get("items", [])
+    return (items[0] if items else None), True
+
+
+# songs: [{"song", "artist", 可選 "track_id", "popularity", "url"}]
+# tokens: spotify_token.SpotifyTokenManager
+# 回傳同順序的新 list，每筆補上 track_id、url、popularity
+def enrich_popularity(songs, tokens, cache=None):
+    cache = cache or default_cache()
+    results = [dict(song) for song in songs]
+    by_id, to_search, stale = {}, [], set()
+
+    for row in results:
+        if row.get("track_id") and row.get("popularity") is not None:
+            cache.put(row["song"], row["artist"], row["track_id"], row.get("url"), row["popularity"])
+            continue
+        entry, status = cache.lookup(row["song"], row["artist"])
+        if status == "hit":
+            row.update(track_id=entry["track_id"], url=entry["url"], popularity=entry["popularity"] or 0)
+            continue
+        track_id = row.get("track_id") or (entry or {}).get("track_id")
+        if status == "stale" and track_id == entry["track_id"]:
+            stale.add(id(row))
+        if track_id:
+            by_id.setdefault(track_id, []).append(row)
+        else:
+            to_search.append(row)
+
+    if by_id:
+        tracks = fetch_tracks(by_id, tokens)
+        print(f"📦 批次查詢 {len(by_id)} 首曲目（{-(-len(by_id) // BATCH_SIZE)} 次請求）")
+        for track_id, rows in by_id.items():
+            track = tracks.get(track_id)
+            if track is None:
+                to_search.extend(rows)
+                continue
+            for row in rows:
+                row.update(track_fields(track))
+                # 快取的 track ID 仍有效：只更新熱度，identity 的 TTL 照舊計算
+                if id(row) in stale:
+                    cache.update_popularity(row["song"], row["artist"], track_fields(track)["popularity"])
+                else:
+                    cache.put(row["song"], row["artist"], **track_fields(track))
+
+    responses = tokens.api_get_all([(SEARCH_URL, search_params(row["song"], row["artist"])) for row in to_search])
+    for row, resp in zip(to_search, responses):
+        track, ok = parse_search(resp, row["song"], row["artist"])
+        if track:
+            row.update(track_fields(track))
+            cache.put(row["song"], row["artist"], **track_fields(track))
+        else:
+            row["popularity"] = 0
+            if ok:
+                cache.put(row["song"], row["artist"])
+    if to_search:
+        print(f"🔍 逐首搜尋 {len(to_search)} 首（無 track ID）")
+    return results
@@ -0,0 +1,53 @@
+# spotify_playlist.py
+# 逐頁讀取 Spotify 播放清單：用 fields= 只要求需要的欄位，依 next 連結
+# 按需翻頁，一首一首 yield 出去。幾千首的播放清單也只會在記憶體中保留一頁。
+#
+#   for track in iter_playlist_tracks(playlist_id, token_manager):
+#       print(track["rank"], track["name"], track["artists"])
+
+PLAYLIST_TRACKS_URL = "https://api.spotify.com/v1/playlists/{playlist_id}/tracks"
+TRACK_FIELDS = "items(track(id,name,popularity,external_urls(spotify),artists(name))),next"
+PAGE_SIZE = 100
+
+
+class PlaylistUnavailable(Exception):
+    def __init__(self, status_code, text):
+        super().__init__(f"HTTP {status_code}: {text[:300]}")
+        self.status_code = status_code
+
+
+def track_row(rank, track):
+    return {
+        "rank": rank,
+        "id": track.get("id"),
+        "name": track.get("name", ""),
+        "artists": [artist.get("name", "") for artist in track.get("artists", [])],
+        "popularity": track.get("popularity"),
+        "url": track.get("external_urls", {}).get("spotify"),
+    }
+
+
+# 依序 yield 每首歌；limit 為最多幾首（None 為全部）。第一頁失敗時丟出 PlaylistUnavailable
+# tokens: spotify_token.SpotifyTokenManager（token 失效時自動換新）
+def iter_playlist_tracks(playlist_id, tokens, limit=None, page_size=PAGE_SIZE):
+    url = PLAYLIST_TRACKS_URL.format(playlist_id=playlist_id)
+    params = {"fields": TRACK_FIELDS, "limit": min(page_size, limit or page_size)}
+    rank = 0
+    while url:
+        resp = tokens.api_get(url, params=params)
+        if resp.status_code != 200:
+            if rank == 0:
+                raise PlaylistUnavailable(resp.status_code, resp.text)
+            print(f"⚠ 播放清單翻頁失敗：HTTP {resp.status_code}，只取得前 {rank} 首")
+            return
+        page = resp.json()
+        for item in page.get("items", []):
+            track = item.get("track")
+            if not track:
+                continue
+            rank += 1
+            yield track_row(rank, track)
+            if limit and rank >= limit:
+                return
+        # next 連結已帶有 fields/limit/offset
+        url, params = page.get("next"), None
@@ -0,0 +1,133 @@
+# spotify_token.py
+# Spotify client-credentials token 管理：所有地區、所有 Spotify 呼叫、甚至
+# 多個同時執行的程序共用同一個 token，而不是每次呼叫都重新申請。
+#
+# - 記憶體快取：同一程序內直接重用
+# - 磁碟快取（TOKEN_CACHE_PATH）：以 fcntl 檔案鎖保護，其他程序讀到有效 token
+#   就不必再申請；只有一個程序會真的去刷新
+# - 提前刷新：剩餘效期少於 REFRESH_MARGIN 秒就換新，避免請求途中過期
+# - api_get / api_get_all：Spotify API 回應 401 時 invalidate()，重新申請後重試一次
+
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from async_http import get_all
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import http_client
+
+TOKEN_URL = "https://accounts.spotify.com/api/token"
+TOKEN_CACHE_PATH = os.getenv("SPOTIFY_TOKEN_CACHE", "logs/spotify_token.json")
+REFRESH_MARGIN = int(os.getenv("SPOTIFY_TOKEN_MARGIN", "300"))
+
+
+@contextmanager
+def file_lock(path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class SpotifyTokenManager:
+    def __init__(self, client_id, client_secret, path=None, margin=REFRESH_MARGIN):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.path = path or TOKEN_CACHE_PATH
+        self.margin = margin
+        # 磁碟快取以 client ID 區分，不同帳號不會互相覆蓋
+        self.key = hashlib.sha1(client_id.encode("utf-8")).hexdigest()[:12]
+        self.requests_made = 0
+        self._token = None
+        self._lock = threading.Lock()
+
+    def _valid(self, token):
+        return bool(token) and token["expires_at"] - time.time() > self.margin
+
+    def _read_disk(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write_disk(self, tokens):
+        tmp_path = f"{self.path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(tokens, f)
+        os.replace(tmp_path, self.path)
+
+    def _request(self):
+        resp = http_client.post(TOKEN_URL, data={"grant_type": "client_credentials"},
+                    auth=(self.client_id, self.client_secret))
+        self.requests_made += 1
+        if resp.status_code != 200:
+            print(f"⚠ 無法取得 Spotify token：{resp.status_code} - {resp.text}")
+            return None
+        data = resp.json()
+        print(f"🎫 成功取得 Spotify token: {data['access_token'][:10]}...")
+        return {"access_token": data["access_token"], "expires_at": time.time() + data.get("expires_in", 3600)}
+
+    def get(self):
+        with self._lock:
+            if self._valid(self._token):
+                return self._token["access_token"]
+            with file_lock(f"{self.path}.lock"):
+                token = self._read_disk().get(self.key)
+                if not self._valid(token):
+                    token = self._request()
+                    if token is None:
+                        return None
+                    self._write_disk({**self._read_disk(), self.key: token})
+                self._token = token
+            return token["access_token"]
+
+    # 收到 401 時丟棄目前的 token，下次 get() 會重新申請
+    def invalidate(self):
+        with self._lock, file_lock(f"{self.path}.lock"):
+            self._token = None
+            tokens = self._read_disk()
+            if tokens.pop(self.key, None) is not None:
+                self._write_disk(tokens)
+
+    def headers(self):
+        return {"Authorization": f"Bearer {self.get()}"}
+
+    # === 帶 token 的 Spotify 請求（401 時換新 token 重試一次） ===
+    def api_get(self, url, **kwargs):
+        resp = http_client.get(url, headers=self.headers(), **kwargs)
+        if resp.status_code == 401:
+            print("🔑 Spotify token 失效（401），重新申請後重試")
+            self.invalidate()
+            resp = http_client.get(url, headers=self.headers(), **kwargs)
+        return resp
+
+    # requests_list: [(url, params)]；同 async_http.get_all，只重送回應 401 的請求
+    def api_get_all(self, requests_list):
+        requests_list = list(requests_list)
+        responses = get_all([(url, params, self.headers()) for url, params in requests_list])
+        rejected = [i for i, resp in enumerate(responses)
+                    if not isinstance(resp, Exception) and resp.status_code == 401]
+        if rejected:
+            print(f"🔑 Spotify token 失效（{len(rejected)} 個請求 401），重新申請後重試")
+            self.invalidate()
+            retried = get_all([(*requests_list[i], self.headers()) for i in rejected])
+            for i, resp in zip(rejected, retried):
+                responses[i] = resp
+        return responses
@@ -0,0 +1,241 @@
+# youtube_enrich.py
+# 批次、節省配額的 YouTube 播放量查詢。
+#
+# YouTube Data API 每日配額（預設 10,000 單位）：search 每次 100 單位，
+# videos?part=statistics 每次 1 單位且一次可查 50 部影片。因此：
+#   - 歌曲 → videoId 的對應永久快取，同一首歌只搜尋一次
+#   - 搜尋不到影片的歌曲只快取 YOUTUBE_MISS_TTL_HOURS，之後重新搜尋
+#   - 播放量每 YOUTUBE_VIEWS_TTL_HOURS 更新，每 50 部影片一次請求
+#   - 記錄當日已用配額（依太平洋時間換日），快用完時不再搜尋/查詢，
+#     改用快取中較舊的播放量
+# 四個地區每天跑一次，新歌之外幾乎只花 stats 的配額。
+# 搜尋與 stats 批次都透過 async_http 同時送出（配額在送出前先預算好）。
+
+import os
+import sys
+import time
+import sqlite3
+import threading
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from async_http import get_all
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from song_identity import song_keys_for
+
+CACHE_PATH = os.getenv("YOUTUBE_CACHE_PATH", "logs/youtube_cache.db")
+VIEWS_TTL = float(os.getenv("YOUTUBE_VIEWS_TTL_HOURS", "24")) * 3600
+MISS_TTL = float(os.getenv("YOUTUBE_MISS_TTL_HOURS", "72")) * 3600
+DAILY_QUOTA = int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))
+# 保留給 stats 批次查詢的配額，搜尋不會用到這部分
+QUOTA_RESERVE = int(os.getenv("YOUTUBE_QUOTA_RESERVE", "200"))
+
+SEARCH_URL = "https://www.googleapis.com/youtube/v3/search"
+VIDEOS_URL = "https://www.googleapis.com/youtube/v3/videos"
+SEARCH_COST = 100
+VIDEOS_COST = 1
+BATCH_SIZE = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS youtube_videos (
+    cache_key TEXT PRIMARY KEY,
+    song      TEXT NOT NULL,
+    artist    TEXT NOT NULL,
+    video_id  TEXT,
+    views     INTEGER,
+    views_at  REAL,
+    last_used REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS youtube_quota (
+    day  TEXT PRIMARY KEY,
+    used INTEGER NOT NULL
+);
+"""
+
+
+# 配額在太平洋時間午夜重置
+def quota_day():
+    return datetime.now(ZoneInfo("America/Los_Angeles")).strftime("%Y-%m-%d")
+
+
+class YouTubeCache:
+    def __init__(self, path=None, daily_quota=DAILY_QUOTA, miss_ttl=MISS_TTL):
+        self.path = path or CACHE_PATH
+        self.daily_quota = daily_quota
+        self.miss_ttl = miss_ttl
+        self.stats = {"searches": 0, "stat_requests": 0, "cached": 0, "stale": 0, "skipped": 0}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def lookup(self, song, artist):
+        key = song_keys_for(song, artist)[2]
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM youtube_videos WHERE cache_key = ?", (key,)).fetchone()
+            # 搜尋不到影片的結果（views_at 為搜尋時間）過期後視為未快取
+            if row and row["video_id"] is None and (row["views_at"] is None
+                                                    or time.time() - row["views_at"] > self.miss_ttl):
+                return None
+            if row:
+                with self.conn:
+                    self.conn.execute("UPDATE youtube_videos SET last_used = ? WHERE cache_key = ?", (time.time(), key))
+            return dict(row) if row else None
+
+    # video_id 為 None（搜尋不到）時，views_at 記錄搜尋時間，MISS_TTL 後重新搜尋
+    def save_video(self, song, artist, video_id):
+        now = time.time()
+        views_at = now if video_id is None else None
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO youtube_videos (cache_key, song, artist, video_id, views_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(cache_key) DO UPDATE SET video_id = excluded.video_id, "
+                "views = NULL, views_at = excluded.views_at, last_used = excluded.last_used",
+                (song_keys_for(song, artist)[2], song, artist, video_id, views_at, now)
+            )
+
+    def save_views(self, views_by_id):
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.executemany("UPDATE youtube_videos SET views = ?, views_at = ? WHERE video_id = ?",
+                                  [(views, now, video_id) for video_id, views in views_by_id.items()])
+
+    # === 每日配額 ===
+    def quota_used(self):
+        row = self.conn.execute("SELECT used FROM youtube_quota WHERE day = ?", (quota_day(),)).fetchone()
+        return row[0] if row else 0
+
+    def quota_left(self):
+        return self.daily_quota - self.quota_used()
+
+    def spend(self, units):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO youtube_quota (day, used) VALUES (?, ?) "
+                "ON CONFLICT(day) DO UPDATE SET used = used + excluded.used", (quota_day(), units)
+            )
+
+    # API 回報 quotaExceeded 時，當日剩餘配額視為 0
+    def exhaust(self):
+        self.spend(max(self.quota_left(), 0))
+
+    def report(self):
+        s = self.stats
+        print(f"📊 YouTube：搜尋 {s['searches']} 次、stats 請求 {s['stat_requests']} 次、快取 {s['cached']} 首、"
+              f"舊資料 {s['stale']} 首、略過 {s['skipped']} 首；今日已用配額 {self.quota_used()}/{self.daily_quota}")
+
+    def close(self):
+        self.conn.close()
+
+
+_default_cache = None
+
+
+def default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = YouTubeCache()
+    return _default_cache
+
+
+def quota_exceeded(resp):
+    if isinstance(resp, Exception) or resp.status_code != 403:
+        return False
+    try:
+        errors = resp.json().get("error", {}).get("errors", [])
+    except ValueError:
+        # A 403 without a JSON body (proxy or HTML error page) is not a quota error
+        return False
+    return any(e.get("reason") in ("quotaExceeded", "dailyLimitExceeded") for e in errors)
+
+
+def search_params(song, artist, api_key):
+    return {"part": "snippet", "q": f"{song} {artist}", "key": api_key, "maxResults": 1, "type": "video"}
+
+
+# 同時搜尋多首歌，回傳同順序的 (videoId 或 None, 是否為有效回應)
+def search_videos(songs, api_key, cache):
+    if not songs:
+        return []
+    responses = get_all([(SEARCH_URL, search_params(song, artist, api_key), None) for song, artist in songs])
+    cache.spend(SEARCH_COST * len(songs))
+    cache.stats["searches"] += len(songs)
+    results = []
+    for (song, artist), resp in zip(songs, responses):
+        if quota_exceeded(resp):
+            cache.exhaust()
+            results.append((None, False))
+        elif isinstance(resp, Exception) or resp.status_code != 200:
+            print(f"⚠ YouTube 搜尋失敗：{resp if isinstance(resp, Exception) else resp.status_code} - {song} / {artist}")
+            results.append((None, False))
+        else:
+            items = resp.json().get("items", [])
+            results.append(((items[0].get("id", {}).get("videoId") if items else None), True))
+    return results
+
+
+# 每 50 部影片一次 stats 請求，回傳 {video_id: views}
+def fetch_views(video_ids, api_key, cache):
+    views = {}
+    ids = list(dict.fromkeys(video_ids))
+    batches = [ids[start:start + BATCH_SIZE] for start in range(0, len(ids), BATCH_SIZE)]
+    affordable = max(cache.quota_left(), 0) // VIDEOS_COST
+    if affordable < len(batches):
+        print("⚠ YouTube 配額不足，部分影片使用快取播放量")
+        batches = batches[:affordable]
+    if not batches:
+        return views
+    responses = get_all([(VIDEOS_URL, {"part": "statistics", "id": ",".join(batch), "key": api_key}, None)
+                         for batch in batches])
+    cache.spend(VIDEOS_COST * len(batches))
+    cache.stats["stat_requests"] += len(batches)
+    for resp in responses:
+        if quota_exceeded(resp):
+            cache.exhaust()
+            continue
+        if isinstance(resp, Exception) or resp.status_code != 200:
+            print(f"⚠ YouTube stats 查詢失敗：{resp if isinstance(resp, Exception) else resp.status_code}")
+            continue
+        for item in resp.json().get("items", []):
+            views[item["id"]] = int(item.get("statistics", {}).get("viewCount", 0))
+    cache.save_views(views)
+    return views
+
+
+# songs: [(song, artist)]，回傳同順序的播放量 list
+def enrich_views(songs, api_key, cache=None):
+    cache = cache or default_cache()
+    now = time.time()
+    entries = [cache.lookup(song, artist) for song, artist in songs]
+
+    # 1. 沒有 videoId 的歌曲才搜尋，並保留配額給 stats
+    missing = [i for i, entry in enumerate(entries) if entry is None]
+    affordable = max(cache.quota_left() - QUOTA_RESERVE, 0) // SEARCH_COST
+    cache.stats["skipped"] += max(len(missing) - affordable, 0)
+    missing = missing[:affordable]
+    for i, (video_id, ok) in zip(missing, search_videos([songs[i] for i in missing], api_key, cache)):
+        if ok:
+            cache.save_video(songs[i][0], songs[i][1], video_id)
+            entries[i] = {"video_id": video_id, "views": None, "views_at": None}
+
+    # 2. 播放量過期的影片批次更新
+    stale_ids = [e["video_id"] for e in entries
+                 if e and e["video_id"] and (e["views_at"] is None or now - e["views_at"] > VIEWS_TTL)]
+    fresh = fetch_views(stale_ids, api_key, cache) if stale_ids else {}
+
+    results = []
+    for entry in entries:
+        if not entry or not entry["video_id"]:
+            results.append(0)
+        elif entry["video_id"] in fresh:
+            results.append(fresh[entry["video_id"]])
+        else:
+            if entry["video_id"] in stale_ids:
+                cache.stats["stale"] += 1
+            else:
+                cache.stats["cached"] += 1
+            results.append(entry["views"] or 0)
+    return results
@@ -0,0 +1,129 @@
+# aggregate_chart.py
+# Combined "Malaysia radio" chart: MY FM, 988 and EIGHT FM merged into one
+# ranking by Borda points over canonical song IDs (song_identity.py).
+#
+#   python aggregate_chart.py weekly              # latest edition of each station
+#   python aggregate_chart.py rolling 2025-06-01  # 4 weeks up to a date
+#
+# A song at rank r on a station's chart earns (DEPTH + 1 - r) * station weight
+# points per edition. Over a window, a station's points are averaged across its
+# editions so a station that changes its chart more often does not count more.
+# Ties go to the song on more stations, then to the better best rank.
+# Rows come out as {"rank", "title", "artist", "points", "stations",
+# "best_rank", "spotify_link"}, the row shape the station renderers take.
+
+import os
+import sys
+import json
+import logging
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+from chart_analytics import load_history_frame
+from snapshot_store import connect
+from song_identity import resolve_many
+
+STATIONS = ["myfm", "988", "eightfm"]
+DEPTH = int(os.getenv("AGGREGATE_DEPTH", "20"))
+CHART_SIZE = int(os.getenv("AGGREGATE_SIZE", "20"))
+ROLLING_DAYS = 28
+
+# Relative weight of each station's chart (default 1.0)
+STATION_WEIGHTS = {}
+
+
+def spotify_search_link(title, artist):
+    return f"https://open.spotify.com/search/{title.replace(' ', '%20')}%20{artist.replace(' ', '%20')}"
+
+
+# Long frame (station, date, rank, title, artist) from freshly scraped charts:
+# {station: [{"rank", "title", "artist"}] or [(title, artist)]}
+def frame_from_charts(charts, date=None):
+    date = date or datetime.now().strftime("%Y-%m-%d")
+    records = []
+    for station, rows in charts.items():
+        for i, row in enumerate(rows or [], 1):
+            if isinstance(row, (list, tuple)):
+                title, artist, rank = row[0], row[1], i
+            else:
+                title, artist, rank = row.get("title", row.get("song")), row["artist"], int(row.get("rank", i))
+            records.append((station, date, rank, title, artist))
+    return pd.DataFrame(records, columns=["station", "date", "rank", "title", "artist"])
+
+
+def aggregate(frame, depth=DEPTH, size=CHART_SIZE, weights=None, conn=None):
+    if frame.empty:
+        return []
+    df = frame.copy()
+    df["song_id"] = resolve_many(zip(df["title"], df["artist"]), conn)
+    # A song listed twice in one edition counts once, at its best rank
+    df = df.sort_values("rank").drop_duplicates(["station", "date", "song_id"])
+
+    weight = df["station"].map(weights or STATION_WEIGHTS).fillna(1.0)
+    editions = df.groupby("station")["date"].transform("nunique")
+    df["points"] = np.clip(depth + 1 - df["rank"], 0, None) * weight / editions
+
+    grouped = df.groupby("song_id")
+    table = grouped.agg(points=("points", "sum"), stations=("station", "nunique"), best_rank=("rank", "min"))
+    # Display the spelling from the most recent, best-placed listing
+    latest = df.sort_values(["date", "rank"], ascending=[False, True]).drop_duplicates("song_id").set_index("song_id")
+    table["title"] = latest["title"]
+    table["artist"] = latest["artist"]
+
+    table = table.sort_values(["points", "stations", "best_rank", "title"],
+                              ascending=[False, False, True, True]).head(size)
+    table["rank"] = np.arange(1, len(table) + 1)
+    table["points"] = table["points"].round(2)
+
+    return [
+        {
+            "rank": int(row.rank),
+            "title": row.title,
+            "artist": row.artist,
+            "points": float(row.points),
+            "stations": int(row.stations),
+            "best_rank": int(row.best_rank),
+            "spotify_link": spotify_search_link(row.title, row.artist),
+        }
+        for row in table.itertuples()
+    ]
+
+
+# Aggregate over the stored snapshots of the last `days` days up to `end`.
+# days=None takes only each station's latest edition on or before `end`.
+def aggregate_window(end=None, days=None, stations=None, **kwargs):
+    end = end or datetime.now().strftime("%Y-%m-%d")
+    stations = stations or STATIONS
+    conn = connect()
+    try:
+        if days:
+            before = (datetime.strptime(end, "%Y-%m-%d") - timedelta(days=days)).strftime("%Y-%m-%d")
+            history = load_history_frame(conn, after=before, until=end)
+        else:
+            history = load_history_frame(conn, until=end, latest=True)
+        history = history[history["station"].isin(stations)]
+        return aggregate(history, conn=conn, **kwargs)
+    finally:
+        conn.close()
+
+
+def weekly_chart(end=None, **kwargs):
+    return aggregate_window(end, None, **kwargs)
+
+
+def rolling_chart(end=None, days=ROLLING_DAYS, **kwargs):
+    return aggregate_window(end, days, **kwargs)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    command = sys.argv[1] if len(sys.argv) > 1 else "weekly"
+    end = sys.argv[2] if len(sys.argv) > 2 else None
+    if command == "weekly":
+        chart = weekly_chart(end)
+    elif command == "rolling":
+        chart = rolling_chart(end)
+    else:
+        sys.exit(f"Unknown command: {command}")
+    print(json.dumps(chart, indent=2, ensure_ascii=False))
@@ -0,0 +1,350 @@
+# blogger_client.py
+# One Blogger API client per process, shared by every publisher (station
+# scripts, Radio_chart, the Spotify charts).
+#
+#   from blogger_client import chart_week, get_client
+#   get_client().upsert_post(f"myfm:{chart_week()}", "Title", "<p>html</p>")
+#
+# The service is built once from the discovery document bundled with
+# google-api-python-client (no discovery fetch over the network) and reused
+# for every post. OAuth credentials are loaded once, refreshed in a background
+# thread shortly before they expire and written back to the token file, so a
+# long run never posts with an expired token and the next run starts with a
+# fresh one.
+#
+# upsert_post() publishes idempotently: a ledger maps each (station/region,
+# chart week) key to its post ID and content hash, so a re-run patches the
+# week's post when the content changed and makes no API call when it didn't.
+# Each post carries a hidden ledger-key marker, so an insert that was never
+# recorded is found again by key rather than by its (weekly repeated) title.
+# publish_many() / publish_posts() do the same for every post of a run at once,
+# sent as a single batch request.
+
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+
+SCOPES = ["https://www.googleapis.com/auth/blogger"]
+TOKEN_PATH = "token.json"
+REFRESH_MARGIN = 300  # seconds before expiry
+LEDGER_PATH = os.getenv("PUBLISH_LEDGER_PATH", "logs/publish_ledger.db")
+PUBLISH_RETRIES = 3
+PUBLISH_WORKERS = 4
+
+LEDGER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS publish_ledger (
+    ledger_key   TEXT PRIMARY KEY,
+    blog_id      TEXT NOT NULL,
+    post_id      TEXT,
+    url          TEXT,
+    title        TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    status       TEXT NOT NULL,
+    updated_at   TEXT NOT NULL
+);
+"""
+
+
+# "2025-W23": one post per chart per ISO week
+def chart_week(date=None):
+    year, week, _ = (date or datetime.now()).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+# One post to publish under a ledger key; `fields` are extra post body fields (e.g. labels)
+PostJob = namedtuple("PostJob", ["key", "title", "content", "fields"], defaults=[{}])
+
+
+# This week's post for `station` as (client, PostJob); each station script's
+# blog_post() returns one. Run as a script, the station upserts it right away;
+# run_charts.publish_all sends every station's post in one batch instead. The
+# key (station + chart week) makes a re-run in the same week update that post.
+def weekly_post(client, station, title, content):
+    return client, PostJob(f"{station}:{chart_week()}", title, content)
+
+
+PublishResult = namedtuple("PublishResult", ["post", "error"], defaults=[None])
+
+
+def retryable(error):
+    if isinstance(error, HttpError):
+        return error.resp.status in (429, 500, 502, 503, 504)
+    return isinstance(error, (OSError, httplib2.HttpLib2Error))
+
+
+# Hidden in every published post so a pending ledger entry finds its own post
+def ledger_marker(key):
+    return f"<!-- publish-ledger:{key} -->"
+
+
+def content_hash(title, content):
+    return hashlib.sha256(f"{title}\0{content}".encode("utf-8")).hexdigest()
+
+
+# === Publish ledger ===
+class PublishLedger:
+    def __init__(self, path=None):
+        self.path = path or LEDGER_PATH
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(LEDGER_SCHEMA)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM publish_ledger WHERE ledger_key = ?", (key,)).fetchone()
+            return dict(row) if row else None
+
+    def record(self, key, blog_id, title, digest, status, post_id=None, url=None):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO publish_ledger (ledger_key, blog_id, post_id, url, title, content_hash, status, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(ledger_key) DO UPDATE SET "
+                "blog_id = excluded.blog_id, post_id = COALESCE(excluded.post_id, post_id), "
+                "url = COALESCE(excluded.url, url), title = excluded.title, content_hash = excluded.content_hash, "
+                "status = excluded.status, updated_at = excluded.updated_at",
+                (key, blog_id, post_id, url, title, digest, status, datetime.now().isoformat(timespec="seconds"))
+            )
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def default_ledger():
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = PublishLedger()
+        return _ledger
+
+
+class BloggerClient:
+    def __init__(self, token_path=TOKEN_PATH, scopes=None, client_secret=None, blog_id=None):
+        self.token_path = token_path
+        self.scopes = scopes or SCOPES
+        self.client_secret = client_secret or os.getenv("BLOGGER_CLIENT_SECRET") or "client_secret.json"
+        self.blog_id = blog_id or os.getenv("BLOG_ID")
+        self._creds = None
+        self._service = None
+        self._lock = threading.RLock()
+        self._timer = None
+
+    # === Credentials ===
+    def credentials(self):
+        with self._lock:
+            if self._creds is None:
+                if os.path.exists(self.token_path):
+                    self._creds = Credentials.from_authorized_user_file(self.token_path, self.scopes)
+                else:
+                    flow = InstalledAppFlow.from_client_secrets_file(self.client_secret, scopes=self.scopes)
+                    self._creds = flow.run_local_server(port=8080)
+                    self._save()
+                if not self._creds.valid and self._creds.refresh_token:
+                    self.refresh()
+                self._schedule_refresh()
+            return self._creds
+
+    def _save(self):
+        tmp_path = f"{self.token_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self._creds.to_json())
+        os.replace(tmp_path, self.token_path)
+
+    def refresh(self):
+        with self._lock:
+            self._creds.refresh(Request())
+            self._save()
+            logging.info("Blogger credentials refreshed.")
+
+    def _schedule_refresh(self):
+        expiry = self._creds.expiry
+        if not expiry or not self._creds.refresh_token:
+            return
+        delay = (expiry.replace(tzinfo=timezone.utc) - datetime.now(timezone.utc)).total_seconds() - REFRESH_MARGIN
+        self._timer = threading.Timer(max(delay, 0), self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            logging.warning(f"Background Blogger token refresh failed: {e}")
+            return
+        self._schedule_refresh()
+
+    # === Service ===
+    def service(self):
+        with self._lock:
+            if self._service is None:
+                self._service = build("blogger", "v3", credentials=self.credentials(),
+                                      static_discovery=True, cache_discovery=False)
+            return self._service
+
+    def insert_post(self, title, content, blog_id=None, is_draft=False, **fields):
+        blog_id = blog_id or self.blog_id
+        if not blog_id:
+            raise ValueError("Environment variable 'BLOG_ID' is not set.")
+        body = {"kind": "blogger#post", "title": title, "content": content, **fields}
+        with self._lock:
+            return self.service().posts().insert(blogId=blog_id, body=body, isDraft=is_draft).execute()
+
+    # The post carrying this ledger key's marker among the blog's latest posts:
+    # recovers the post ID when a previous run inserted it but died before
+    # recording it. Titles repeat every week, so only the marker is trusted.
+    def find_post_by_key(self, key, blog_id=None):
+        marker = ledger_marker(key)
+        with self._lock:
+            response = self.service().posts().list(blogId=blog_id or self.blog_id, maxResults=20,
+                                                   fetchBodies=True, status="live").execute()
+        return next((post for post in response.get("items", []) if marker in post.get("content", "")), None)
+
+    # Insert the post for `key` once, patch it when the content changes, and
+    # skip the API entirely when it is unchanged. Returns the post resource
+    # (with "skipped": True when nothing was sent).
+    def upsert_post(self, key, title, content, blog_id=None, ledger=None, **fields):
+        result = self.publish_many([PostJob(key, title, content, fields)], blog_id, ledger)[key]
+        if result.error:
+            raise result.error
+        return result.post
+
+    # === Batched publishing ===
+    # Upsert every job of a run together: unchanged posts are skipped, and the
+    # inserts/patches go out as one batch HTTP request. Items that fail with a
+    # retryable error are re-sent with backoff. Returns {key: PublishResult}.
+    def publish_many(self, jobs, blog_id=None, ledger=None):
+        blog_id = blog_id or self.blog_id
+        if not blog_id:
+            raise ValueError("Environment variable 'BLOG_ID' is not set.")
+        ledger = ledger or default_ledger()
+        results, pending = {}, []
+
+        for job in jobs:
+            digest = content_hash(job.title, job.content)
+            entry = ledger.get(job.key)
+            if entry and entry["post_id"] and entry["status"] == "published" and entry["content_hash"] == digest:
+                logging.info(f"[{job.key}] post unchanged, skipping Blogger call: {entry['url']}")
+                post = {"id": entry["post_id"], "url": entry["url"], "title": entry["title"], "skipped": True}
+                results[job.key] = PublishResult(post)
+                continue
+            post_id = entry["post_id"] if entry else None
+            if entry and not post_id and entry["status"] == "pending":
+                found = self.find_post_by_key(job.key, blog_id)
+                post_id = found["id"] if found else None
+            if not post_id:
+                ledger.record(job.key, blog_id, job.title, digest, "pending")
+            pending.append((job, digest, post_id))
+
+        for attempt in range(PUBLISH_RETRIES + 1):
+            if not pending:
+                break
+            if attempt:
+                time.sleep(2 ** attempt)
+                logging.info(f"Retrying {len(pending)} Blogger post(s), attempt {attempt + 1}")
+            outcomes = self._execute_batch([self._post_request(job, blog_id, post_id) for job, _, post_id in pending])
+            retry = []
+            for (job, digest, post_id), (post, error) in zip(pending, outcomes):
+                if error is None:
+                    logging.info(f"[{job.key}] {'updated' if post_id else 'published'} post: {post.get('url')}")
+                    ledger.record(job.key, blog_id, job.title, digest, "published", post["id"], post.get("url"))
+                    results[job.key] = PublishResult(post)
+                elif post_id and isinstance(error, HttpError) and error.resp.status == 404:
+                    # The post was deleted on Blogger: insert it again
+                    ledger.record(job.key, blog_id, job.title, digest, "pending")
+                    retry.append((job, digest, None))
+                elif attempt < PUBLISH_RETRIES and retryable(error):
+                    retry.append((job, digest, post_id))
+                else:
+                    logging.error(f"[{job.key}] Blogger publish failed: {error}")
+                    results[job.key] = PublishResult(None, error)
+            pending = retry
+        for job, _, _ in pending:
+            results[job.key] = PublishResult(None, RuntimeError("gave up after retries"))
+        return results
+
+    def _post_request(self, job, blog_id, post_id):
+        posts = self.service().posts()
+        body = {"title": job.title, "content": job.content + ledger_marker(job.key), **job.fields}
+        if post_id:
+            return posts.patch(blogId=blog_id, postId=post_id, body=body)
+        return posts.insert(blogId=blog_id, body={"kind": "blogger#post", **body}, isDraft=False)
+
+    # [(response, exception)] in request order
+    def _execute_batch(self, requests):
+        if len(requests) == 1:
+            try:
+                with self._lock:
+                    return [(requests[0].execute(), None)]
+            except Exception as e:
+                return [(None, e)]
+
+        outcomes = {}
+        def callback(request_id, response, exception):
+            outcomes[int(request_id)] = (response, exception)
+
+        batch = self.service().new_batch_http_request(callback=callback)
+        for i, request in enumerate(requests):
+            batch.add(request, request_id=str(i))
+        try:
+            with self._lock:
+                batch.execute()
+        except Exception as e:
+            logging.warning(f"Blogger batch request failed ({e}), sending posts individually")
+            return self._execute_concurrently(requests)
+        return [outcomes.get(i, (None, RuntimeError("no batch response"))) for i in range(len(requests))]
+
+    # Fallback when batching is unavailable: a small thread pool, each request
+    # on its own authorized HTTP connection (httplib2 is not thread-safe)
+    def _execute_concurrently(self, requests):
+        def run(request):
+            try:
+                return request.execute(http=AuthorizedHttp(self.credentials(), http=httplib2.Http())), None
+            except Exception as e:
+                return None, e
+        with ThreadPoolExecutor(max_workers=min(PUBLISH_WORKERS, len(requests))) as executor:
+            return list(executor.map(run, requests))
+
+    def close(self):
+        if self._timer:
+            self._timer.cancel()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+# One client per token file and scope set, reused for every post in the process
+def get_client(token_path=TOKEN_PATH, scopes=None, client_secret=None, blog_id=None):
+    key = (os.path.abspath(token_path), tuple(scopes or SCOPES), blog_id)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = BloggerClient(token_path, scopes, client_secret, blog_id)
+        return _clients[key]
+
+
+# Publish jobs that may belong to different clients (e.g. 988 uses its own
+# credentials): one batch per client. jobs: [(client, PostJob)]
+def publish_posts(jobs):
+    by_client = {}
+    for client, job in jobs:
+        by_client.setdefault(client, []).append(job)
+    results = {}
+    for client, client_jobs in by_client.items():
+        results.update(client.publish_many(client_jobs))
+    return results
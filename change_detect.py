@@ -0,0 +1,181 @@
+# change_detect.py
+# Skip work when a station chart has not changed since the last run.
+#
+# Each chart gets a fingerprint over its normalized (rank, title, artist) rows.
+# The fingerprint last handled per station and stage ("write", "publish") is
+# kept in FINGERPRINTS_PATH; a stage whose fingerprint matches is skipped.
+# Plain HTTP fetches also go through conditional GETs (ETag/If-Modified-Since)
+# so an unchanged page costs a 304 instead of a full download, and what was
+# parsed out of it last time is reused instead of parsing the cached copy again.
+
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+import unicodedata
+from datetime import datetime
+
+from http_client import get
+from snapshot_store import latest_snapshot
+
+FINGERPRINTS_PATH = os.getenv("CHART_FINGERPRINTS_PATH", "logs/chart_fingerprints.json")
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", "logs/http_cache")
+
+_lock = threading.Lock()
+
+
+def write_json_atomic(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+# === Fingerprints ===
+def normalize_text(value):
+    text = unicodedata.normalize("NFKC", str(value or "")).casefold()
+    return re.sub(r"\s+", " ", text).strip()
+
+
+# Rows may come from any scraper: eightFM uses "song", the others "title",
+# and the eightFM file wraps its rows in {"chart": [...]}.
+def normalize_rows(rows):
+    if isinstance(rows, dict):
+        rows = rows.get("chart", [])
+    normalized = []
+    for row in rows:
+        if isinstance(row, (list, tuple)):
+            rank, (title, artist) = len(normalized) + 1, row
+        else:
+            rank, title, artist = row.get("rank"), row.get("title", row.get("song")), row.get("artist")
+        normalized.append([str(rank), normalize_text(title), normalize_text(artist)])
+    return sorted(normalized, key=lambda r: (int(r[0]) if r[0].isdigit() else 0, r[1]))
+
+
+def chart_fingerprint(rows):
+    payload = json.dumps(normalize_rows(rows), ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def load_fingerprints():
+    try:
+        with open(FINGERPRINTS_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+# Seed for the "write" stage: the newest snapshot in the chart store
+def latest_snapshot_fingerprint(station):
+    try:
+        snapshot = latest_snapshot(station)
+    except Exception as e:
+        logging.warning(f"[{station}] failed to read latest snapshot: {e}")
+        return None
+    return chart_fingerprint(snapshot["rows"]) if snapshot else None
+
+
+def last_fingerprint(station, stage):
+    entry = load_fingerprints().get(station, {}).get(stage)
+    if entry:
+        return entry["fingerprint"]
+    if stage == "write":
+        return latest_snapshot_fingerprint(station)
+    return None
+
+
+def is_unchanged(station, stage, fingerprint):
+    unchanged = last_fingerprint(station, stage) == fingerprint
+    if unchanged:
+        logging.info(f"[{station}] chart unchanged since last {stage}, skipping.")
+    return unchanged
+
+
+def mark_done(station, stage, fingerprint):
+    with _lock:
+        fingerprints = load_fingerprints()
+        fingerprints.setdefault(station, {})[stage] = {
+            "fingerprint": fingerprint,
+            "at": datetime.now().isoformat(timespec="seconds"),
+        }
+        write_json_atomic(FINGERPRINTS_PATH, fingerprints)
+
+
+# === Publish stage ===
+# Render and post `chart` with publish(fingerprint), unless it is the chart
+# last published for `station` (then nothing is rendered or posted; returns
+# None). publish() returns a truthy value once the post is live, and only then
+# is the chart recorded as published. A falsy return (the post failed, or was
+# only queued and its job calls mark_done itself) leaves it for the next run.
+def publish_if_changed(station, chart, publish):
+    fingerprint = chart_fingerprint(chart)
+    if is_unchanged(station, "publish", fingerprint):
+        return None
+    result = publish(fingerprint)
+    if result:
+        mark_done(station, "publish", fingerprint)
+    return result
+
+
+# === Conditional GET ===
+def _cache_paths(url):
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return os.path.join(HTTP_CACHE_DIR, f"{key}.json"), os.path.join(HTTP_CACHE_DIR, f"{key}.body")
+
+
+# GET `url`, revalidating a cached copy with ETag/Last-Modified. Returns the
+# body text and whether the server answered 304 Not Modified.
+def conditional_get(url, headers=None, timeout=15):
+    meta_path, body_path = _cache_paths(url)
+    request_headers = dict(headers or {})
+    meta = {}
+    if os.path.exists(meta_path) and os.path.exists(body_path):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("etag"):
+            request_headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            request_headers["If-Modified-Since"] = meta["last_modified"]
+
+    res = get(url, headers=request_headers, timeout=timeout)
+    if res.status_code == 304 and meta:
+        logging.info(f"Not modified since last fetch: {url}")
+        with open(body_path, "r", encoding="utf-8") as f:
+            return f.read(), True
+    res.raise_for_status()
+
+    etag, last_modified = res.headers.get("ETag"), res.headers.get("Last-Modified")
+    if etag or last_modified:
+        with _lock:
+            os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+            with open(body_path, "w", encoding="utf-8") as f:
+                f.write(res.text)
+            write_json_atomic(meta_path, {"url": url, "etag": etag, "last_modified": last_modified})
+    return res.text, False
+
+
+# parse(body) for a conditional_get result. When the body was not modified,
+# the result parsed from it last time is returned without parsing. `variant`
+# names how it was parsed (e.g. the selectors), so a changed parser re-parses.
+# Results must be JSON-serializable; None is never cached.
+def parse_cached(url, body, not_modified, parse, variant=""):
+    meta_path, _ = _cache_paths(url)
+    parsed_path = f"{meta_path[:-len('.json')]}.parsed.json"
+    tag = hashlib.sha1(variant.encode("utf-8")).hexdigest()
+    if not_modified:
+        try:
+            with open(parsed_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached["variant"] == tag:
+                return cached["result"]
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+    result = parse(body)
+    # Only bodies conditional_get keeps a copy of can come back as not modified
+    if result is not None and os.path.exists(meta_path):
+        with _lock:
+            write_json_atomic(parsed_path, {"variant": tag, "result": result})
+    return result
@@ -0,0 +1,271 @@
+# chart_analytics.py
+# Rank-trajectory stats over the stored chart history: for every song on every
+# station, weeks on chart, peak position, debut date, last-week position and
+# rank movement.
+#
+#   python chart_analytics.py rebuild        # full vectorized pass over history
+#
+# A "week" is one stored chart edition: unchanged charts are not stored again
+# (see change_detect.py), so each snapshot is a new edition of the chart.
+# Songs are joined on their canonical song ID (song_identity.py), so spelling
+# variants of one song share a single history.
+# The stats live in the song_stats table next to the snapshots and are updated
+# incrementally by apply_snapshot() each time a new snapshot is saved, so the
+# cost of a run does not grow with the length of the history.
+
+import sys
+import logging
+import numpy as np
+import pandas as pd
+
+from snapshot_store import connect
+from song_identity import resolve_many, resolve_song
+
+STATS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS song_stats (
+    station      TEXT NOT NULL,
+    song_key     TEXT NOT NULL,
+    title        TEXT NOT NULL,
+    artist       TEXT NOT NULL,
+    weeks        INTEGER NOT NULL,
+    peak         INTEGER NOT NULL,
+    debut        TEXT NOT NULL,
+    last_date    TEXT NOT NULL,
+    last_edition INTEGER NOT NULL,
+    last_rank    INTEGER NOT NULL,
+    prev_rank    INTEGER,
+    PRIMARY KEY (station, song_key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS stats_state (
+    station   TEXT PRIMARY KEY,
+    last_date TEXT NOT NULL,
+    last_hash TEXT NOT NULL,
+    editions  INTEGER NOT NULL
+);
+"""
+
+STATS_COLUMNS = ["station", "song_key", "title", "artist", "weeks", "peak", "debut",
+                 "last_date", "last_edition", "last_rank", "prev_rank"]
+
+
+def stats_connect():
+    conn = connect()
+    conn.executescript(STATS_SCHEMA)
+    return conn
+
+
+def song_key(title, artist, conn=None):
+    return resolve_song(title, artist, conn)
+
+
+def song_keys(titles, artists, conn=None):
+    return resolve_many(zip(titles, artists), conn)
+
+
+# Snapshot rows dated after `after` and up to `until`. latest=True keeps only
+# each station's newest snapshot in that range (picked in SQL, on the
+# (station, chart_date) primary key).
+def load_history_frame(conn, station=None, after=None, until=None, latest=False):
+    query = ("SELECT s.station, s.chart_date AS date, r.rank, r.title, r.artist "
+             "FROM snapshots s JOIN chart_rows r ON r.content_hash = s.content_hash")
+    clauses, params = [], []
+    if station:
+        clauses.append("s.station = ?")
+        params.append(station)
+    if after:
+        clauses.append("s.chart_date > ?")
+        params.append(after)
+    if until:
+        clauses.append("s.chart_date <= ?")
+        params.append(until)
+    if latest:
+        clauses.append("s.chart_date = (SELECT MAX(m.chart_date) FROM snapshots m WHERE m.station = s.station"
+                       + (" AND m.chart_date <= ?" if until else "") + ")")
+        params += [until] if until else []
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += " ORDER BY s.station, s.chart_date, r.position"
+    return pd.read_sql_query(query, conn, params=params)
+
+
+# === Full pass ===
+# One vectorized pass over every snapshot of every station.
+def compute_song_stats(history, conn=None):
+    if history.empty:
+        return pd.DataFrame(columns=STATS_COLUMNS)
+    df = history.copy()
+    df["song_key"] = song_keys(df["title"], df["artist"], conn)
+    # Edition number per station: 1 for the oldest snapshot, 2 for the next...
+    df["edition"] = df.groupby("station")["date"].rank(method="dense").astype(int)
+    # A song listed twice in one edition counts once, at its best rank
+    df = df.sort_values("rank").drop_duplicates(["station", "edition", "song_key"])
+    df = df.sort_values(["station", "song_key", "edition"])
+
+    grouped = df.groupby(["station", "song_key"], sort=False)
+    stats = grouped.agg(
+        weeks=("edition", "size"),
+        peak=("rank", "min"),
+        debut=("date", "min"),
+        last_date=("date", "max"),
+        last_edition=("edition", "max"),
+    )
+    last = grouped.tail(1).set_index(["station", "song_key"])
+    stats["title"] = last["title"]
+    stats["artist"] = last["artist"]
+    stats["last_rank"] = last["rank"]
+
+    # Rank in the edition right before the song's latest one (if it charted then)
+    previous = df.assign(edition=df["edition"] + 1).set_index(["station", "song_key", "edition"])["rank"]
+    lookup = pd.MultiIndex.from_arrays([stats.index.get_level_values(0), stats.index.get_level_values(1),
+                                        stats["last_edition"]])
+    stats["prev_rank"] = previous.reindex(lookup).to_numpy()
+    return stats.reset_index()[STATS_COLUMNS]
+
+
+def write_stats(conn, stats, stations):
+    records = [
+        tuple(None if (isinstance(v, float) and np.isnan(v)) else (int(v) if isinstance(v, np.integer) else v)
+              for v in row)
+        for row in stats[STATS_COLUMNS].itertuples(index=False)
+    ]
+    with conn:
+        conn.executemany("DELETE FROM song_stats WHERE station = ?", [(s,) for s in stations])
+        conn.executemany(f"INSERT INTO song_stats ({', '.join(STATS_COLUMNS)}) "
+                         f"VALUES ({', '.join('?' * len(STATS_COLUMNS))})", records)
+
+
+# Content hash of the snapshot stored for `date`: a re-run on the same day
+# replaces that day's snapshot, so the date alone does not identify an edition
+def snapshot_hash(conn, station, date):
+    row = conn.execute("SELECT content_hash FROM snapshots WHERE station = ? AND chart_date = ?",
+                       (station, date)).fetchone()
+    return row[0] if row else None
+
+
+def rebuild_stats(station=None):
+    conn = stats_connect()
+    try:
+        history = load_history_frame(conn, station)
+        stats = compute_song_stats(history, conn)
+        stations = [station] if station else sorted(history["station"].unique())
+        write_stats(conn, stats, stations)
+        editions = history.groupby("station")["date"].agg(["max", "nunique"])
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO stats_state (station, last_date, last_hash, editions) VALUES (?, ?, ?, ?)",
+                [(s, row["max"], snapshot_hash(conn, s, row["max"]), int(row["nunique"]))
+                 for s, row in editions.iterrows()]
+            )
+        logging.info(f"Rebuilt song stats for {len(stations)} station(s), {len(stats)} songs.")
+        return stats
+    finally:
+        conn.close()
+
+
+# === Incremental update ===
+# Fold snapshots newer than the last processed one into song_stats. Only the
+# new editions and this station's current stats are read. When the last
+# processed day's snapshot was replaced since (a second run that day with a
+# changed chart), its old rows are already folded in, so the station is rebuilt.
+def apply_snapshot(station):
+    conn = stats_connect()
+    try:
+        state = conn.execute("SELECT last_date, last_hash, editions FROM stats_state WHERE station = ?",
+                             (station,)).fetchone()
+        if state is None or snapshot_hash(conn, station, state["last_date"]) != state["last_hash"]:
+            conn.close()
+            conn = None
+            return rebuild_stats(station)
+
+        new = load_history_frame(conn, station, after=state["last_date"])
+        if new.empty:
+            return None
+        stats = pd.read_sql_query("SELECT * FROM song_stats WHERE station = ?", conn, params=[station])
+        stats = stats.set_index("song_key")
+        editions = state["editions"]
+
+        for date, rows in new.groupby("date", sort=True):
+            editions += 1
+            rows = rows.assign(song_key=song_keys(rows["title"], rows["artist"], conn))
+            rows = rows.sort_values("rank").drop_duplicates("song_key").set_index("song_key")
+            known = rows.index.intersection(stats.index)
+            fresh = rows.index.difference(stats.index)
+
+            charted_last_time = stats.loc[known, "last_edition"] == editions - 1
+            stats.loc[known, "prev_rank"] = stats.loc[known, "last_rank"].where(charted_last_time, np.nan)
+            stats.loc[known, "weeks"] += 1
+            stats.loc[known, "peak"] = np.minimum(stats.loc[known, "peak"], rows.loc[known, "rank"])
+            stats.loc[known, "last_rank"] = rows.loc[known, "rank"]
+            stats.loc[known, "title"] = rows.loc[known, "title"]
+            stats.loc[known, "artist"] = rows.loc[known, "artist"]
+            stats.loc[known, "last_date"] = date
+            stats.loc[known, "last_edition"] = editions
+
+            added = pd.DataFrame({
+                "station": station,
+                "title": rows.loc[fresh, "title"],
+                "artist": rows.loc[fresh, "artist"],
+                "weeks": 1,
+                "peak": rows.loc[fresh, "rank"],
+                "debut": date,
+                "last_date": date,
+                "last_edition": editions,
+                "last_rank": rows.loc[fresh, "rank"],
+                "prev_rank": np.nan,
+            }, index=fresh)
+            stats = pd.concat([stats, added]) if len(stats) else added
+
+        stats = stats.reset_index().rename(columns={"index": "song_key"})
+        write_stats(conn, stats, [station])
+        with conn:
+            last_date = new["date"].max()
+            conn.execute("INSERT OR REPLACE INTO stats_state (station, last_date, last_hash, editions) "
+                         "VALUES (?, ?, ?, ?)", (station, last_date, snapshot_hash(conn, station, last_date), editions))
+        return stats
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+# === Rendering helpers ===
+# Copy of `chart` rows with a "trend" dict {"new", "movement", "peak", "weeks"}
+# taken from the latest stats. Rows without stats are returned unchanged.
+def annotate_chart(station, chart):
+    try:
+        conn = stats_connect()
+        try:
+            rows = conn.execute(
+                "SELECT song_key, weeks, peak, prev_rank, last_edition FROM song_stats WHERE station = ?",
+                (station,)
+            ).fetchall()
+            keys = song_keys([entry.get("title", entry.get("song")) for entry in chart],
+                             [entry["artist"] for entry in chart], conn)
+        finally:
+            conn.close()
+    except Exception as e:
+        logging.warning(f"[{station}] trend stats unavailable: {e}")
+        return chart
+    stats = {row["song_key"]: row for row in rows}
+
+    annotated = []
+    for key, entry in zip(keys, chart):
+        stat = stats.get(key)
+        entry = dict(entry)
+        if stat:
+            entry["trend"] = {
+                "new": stat["weeks"] == 1,
+                "movement": stat["prev_rank"] - int(entry["rank"]) if stat["prev_rank"] is not None else None,
+                "peak": stat["peak"],
+                "weeks": stat["weeks"],
+            }
+        annotated.append(entry)
+    return annotated
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    command = sys.argv[1] if len(sys.argv) > 1 else "rebuild"
+    if command == "rebuild":
+        rebuild_stats(sys.argv[2] if len(sys.argv) > 2 else None)
+    else:
+        sys.exit(f"Unknown command: {command}")
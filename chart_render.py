@@ -0,0 +1,224 @@
+# chart_render.py
+# One HTML renderer for every chart post: station tables (MY FM, Spotify),
+# ordered lists (988, the combined radio chart) and cards (EIGHT FM).
+#
+#   from chart_render import render
+#   html = render(rows, "table", theme="myfm")
+#   html = render(rows, "list", theme="988", heading="988 音乐排行榜")
+#   pages = render_all(rows, theme="myfm")   # {"table": ..., "list": ..., "cards": ...}
+#
+#   python chart_render.py bench 20 2000 10000   # micro-benchmark
+#
+# Each layout builds its rows as escaped f-strings in one list and joins them
+# once, so rendering is linear in the number of rows. render_all() renders
+# several layouts in the same pass, escaping each row only once. Every title,
+# artist and cell is HTML-escaped and links are limited to http(s) URLs.
+#
+# Rows are dicts. Station rows use rank/title/artist/spotify_link (EIGHT FM's
+# "song" is read as the title); rows annotated by chart_analytics carry a
+# "trend" dict. Tables can show any keys through `columns`.
+
+import sys
+import timeit
+from collections import namedtuple
+from html import escape
+
+LAYOUTS = ("table", "list", "cards")
+
+# header: column title, key: row key, link: render the value as a link
+Column = namedtuple("Column", ["header", "key", "link"], defaults=[False])
+
+STATION_COLUMNS = [
+    Column("排名", "rank"),
+    Column("歌曲", "title"),
+    Column("歌手", "artist"),
+    Column("Spotify 連結", "spotify_link", link=True),
+]
+
+THEMES = {
+    "default": {
+        "font": "sans-serif",
+        "header_bg": "#f2f2f2",
+        "accent": "#333333",
+        "table_link": "🎵",         # link text in table cells
+        "list_link": "Spotify",     # link text in lists
+        "separator": " by ",        # between title and artist in lists
+        "link_break": " - ",        # between artist and link in lists
+        "weeks_label": "週",
+    },
+    "myfm": {"accent": "#e4007f"},
+    "988": {"accent": "#d71920", "weeks_label": "周"},
+    "eightfm": {"accent": "#f7941d", "weeks_label": "周"},
+    "radio": {"accent": "#1a73e8", "separator": " – ", "link_break": "<br>", "list_link": "Listen on Spotify"},
+    "spotify": {"accent": "#1db954"},
+}
+
+
+def theme_settings(theme):
+    return {**THEMES["default"], **THEMES.get(theme, {})}
+
+
+# "NEW", "RE", "▲3", "▼2" or "–" for a trend dict from chart_analytics.annotate_chart()
+def trend_label(trend):
+    if trend["new"]:
+        return "NEW"
+    movement = trend["movement"]
+    if movement is None:
+        return "RE"
+    if movement > 0:
+        return f"▲{movement}"
+    if movement < 0:
+        return f"▼{-movement}"
+    return "–"
+
+
+# === Escaping ===
+def esc(value):
+    return "" if value is None else escape(str(value))
+
+
+def safe_url(url):
+    url = str(url or "").strip()
+    return escape(url) if url.lower().startswith(("https://", "http://")) else "#"
+
+
+def title_of(row):
+    return row.get("title", row.get("song"))
+
+
+# Escape a row once for every layout
+def escaped_cells(row):
+    return {"rank": esc(row.get("rank")), "title": esc(title_of(row)), "artist": esc(row.get("artist")),
+            "link": safe_url(row.get("spotify_link"))}
+
+
+# === Layouts ===
+# Each layout is (head, row, tail): head(t, columns, show_trend) opens it,
+# row(row, cells, t, columns, show_trend) renders one row from its escaped
+# cells, and tail closes it.
+def table_head(t, columns, show_trend):
+    headers = [f"<th>{esc(column.header)}</th>" for column in columns]
+    if show_trend:
+        headers[1:1] = ["<th>走勢</th><th>最高</th><th>上榜週數</th>"]
+    return (f'<table border="1" cellpadding="6" cellspacing="0" style="border-collapse:collapse; width:100%; '
+            f'font-family:{t["font"]};"><thead><tr style="background-color:{t["header_bg"]}; '
+            f'border-bottom:2px solid {t["accent"]};">{"".join(headers)}</tr></thead><tbody>')
+
+
+def table_row(row, cells, t, columns, show_trend):
+    trend = trend_cells(row.get("trend")) if show_trend else ""
+    link = t["table_link"]
+    if columns is STATION_COLUMNS:
+        # The station posts: one f-string per row
+        return (f"<tr><td>{cells['rank']}</td>{trend}<td>{cells['title']}</td><td>{cells['artist']}</td>"
+                f"<td><a href='{cells['link']}' target='_blank'>{link}</a></td></tr>")
+    tds = [f"<td><a href='{safe_url(row.get(column.key))}' target='_blank'>{link}</a></td>" if column.link
+           else f"<td>{cells[column.key] if column.key in cells else esc(row.get(column.key))}</td>"
+           for column in columns]
+    if show_trend:
+        tds.insert(1, trend)
+    return f"<tr>{''.join(tds)}</tr>"
+
+
+def trend_cells(trend):
+    if not trend:
+        return "<td></td><td></td><td></td>"
+    return f"<td>{trend_label(trend)}</td><td>peak #{trend['peak']}</td><td>{trend['weeks']}</td>"
+
+
+def list_head(t, columns, show_trend):
+    return "<ol>"
+
+
+def list_row(row, cells, t, columns, show_trend):
+    trend = row.get("trend")
+    note = (f" <small>{trend_label(trend)} · peak #{trend['peak']} · {trend['weeks']} {t['weeks_label']}</small>"
+            if trend else "")
+    return (f"<li><b>{cells['title']}</b>{t['separator']}{cells['artist']}{t['link_break']}"
+            f"<a href='{cells['link']}' target='_blank'>{t['list_link']}</a>{note}</li>")
+
+
+def cards_head(t, columns, show_trend):
+    return ""
+
+
+def card_row(row, cells, t, columns, show_trend):
+    return f"<p><b>{cells['rank']}. {cells['title']}</b><br><i>{cells['artist']}</i></p>"
+
+
+LAYOUT_PARTS = {
+    "table": (table_head, table_row, "</tbody></table>"),
+    "list": (list_head, list_row, "</ol>"),
+    "cards": (cards_head, card_row, ""),
+}
+
+
+# Every requested layout in one pass over the rows: each row is escaped once
+# and appended to every layout's output list. Returns {layout: html}.
+def render_all(rows, layouts=LAYOUTS, theme="default", columns=None, heading=None, subheading=None):
+    t = theme_settings(theme)
+    rows = rows if isinstance(rows, list) else list(rows)
+    columns = columns or STATION_COLUMNS
+    show_trend = any(row.get("trend") for row in rows)
+    top = ""
+    if heading:
+        top += f'<h2 style="color:{t["accent"]};">{esc(heading)}</h2>'
+    if subheading:
+        top += f"<p>{esc(subheading)}</p>"
+
+    outputs = {layout: [top, LAYOUT_PARTS[layout][0](t, columns, show_trend)] for layout in layouts}
+    writers = [(outputs[layout].append, LAYOUT_PARTS[layout][1]) for layout in layouts]
+    for row in rows:
+        cells = escaped_cells(row)
+        for append, row_html in writers:
+            append(row_html(row, cells, t, columns, show_trend))
+    return {layout: "".join(out) + LAYOUT_PARTS[layout][2] for layout, out in outputs.items()}
+
+
+def render(rows, layout="table", theme="default", columns=None, heading=None, subheading=None):
+    return render_all(rows, (layout,), theme, columns, heading, subheading)[layout]
+
+
+# === Micro-benchmark ===
+def sample_rows(n):
+    return [{
+        "rank": i, "title": f"Song <{i}> & Co", "artist": f"Artist \"{i % 50}\"",
+        "spotify_link": f"https://open.spotify.com/search/song%20{i}",
+        "trend": {"new": False, "movement": i % 7 - 3, "peak": max(1, i // 2), "weeks": i % 30},
+    } for i in range(1, n + 1)]
+
+
+# Baseline: the old renderers' html += f"..." per row, without escaping
+def concat_table(rows):
+    html = '<table border="1" cellpadding="6" cellspacing="0" style="border-collapse:collapse; width:100%; font-family:sans-serif;">'
+    html += '<thead><tr style="background-color:#f2f2f2;"><th>排名</th><th>走勢</th><th>最高</th><th>上榜週數</th><th>歌曲</th><th>歌手</th><th>Spotify 連結</th></tr></thead><tbody>'
+    for entry in rows:
+        trend = entry["trend"]
+        html += (f"<tr><td>{entry['rank']}</td><td>{trend_label(trend)}</td><td>peak #{trend['peak']}</td>"
+                 f"<td>{trend['weeks']}</td><td>{entry['title']}</td><td>{entry['artist']}</td>"
+                 f"<td><a href='{entry['spotify_link']}' target='_blank'>🎵</a></td></tr>")
+    html += '</tbody></table>'
+    return html
+
+
+def benchmark(sizes=(20, 200, 2000, 10000), repeat=5):
+    print(f"{'rows':>7} {'concat, raw':>12} {'table':>8} {'list':>8} {'cards':>8} {'all, one pass':>14}"
+          f"   (ms, best of {repeat})")
+    for n in sizes:
+        rows = sample_rows(n)
+        number = max(1, 2000 // n)
+
+        def best(fn, number=number):
+            return min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1000
+
+        timings = [best(lambda rows=rows: concat_table(rows))]
+        timings += [best(lambda rows=rows, layout=layout: render(rows, layout)) for layout in LAYOUTS]
+        timings.append(best(lambda rows=rows: render_all(rows)))
+        print(f"{n:>7} {timings[0]:>12.2f} {timings[1]:>8.2f} {timings[2]:>8.2f} {timings[3]:>8.2f} {timings[4]:>14.2f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        benchmark([int(n) for n in sys.argv[2:]] or (20, 200, 2000, 10000))
+    else:
+        sys.exit("usage: python chart_render.py bench [rows ...]")
@@ -0,0 +1,304 @@
+# chrome_pool.py
+# Shared warm Chrome pool: one browser process is started once and hands out
+# tabs to every station scraper instead of each scraper cold-starting Chrome.
+
+import os
+import json
+import queue
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+# Recycle a browser after this many pages to keep its memory in check
+MAX_PAGES_PER_DRIVER = int(os.getenv("CHROME_MAX_PAGES", "20"))
+
+# Local installs used when CHROME_BINARY / CHROMEDRIVER_PATH are not set and
+# the path exists; otherwise Selenium locates Chrome and its driver itself.
+LOCAL_CHROME_BINARIES = ["/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"]
+LOCAL_CHROMEDRIVERS = ["/Users/macp/Documents/MUSIC_CHART/chromedriver_mac_arm64/chromedriver"]
+
+
+def configured_path(env_name, local_paths):
+    return os.getenv(env_name) or next((path for path in local_paths if os.path.exists(path)), None)
+
+# === Resource blocking ===
+# None of the artwork, fonts, video or ad/analytics scripts on the station
+# pages is needed to read rank/title/artist.
+MEDIA_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+    "*.mp3", "*.mp4", "*.m3u8", "*.ts", "*.aac", "*.webm",
+]
+TRACKER_PATTERNS = [
+    "*doubleclick.net*", "*googlesyndication.com*", "*googletagmanager.com*",
+    "*google-analytics.com*", "*googletagservices.com*", "*adservice.google.*",
+    "*facebook.net*", "*connect.facebook.com*", "*scorecardresearch.com*",
+    "*hotjar.com*", "*taboola.com*", "*outbrain.com*", "*criteo.*", "*amazon-adsystem.com*",
+]
+BLOCK_PROFILES = {
+    "off": {"images": False, "eager": False, "patterns": []},
+    "trackers": {"images": False, "eager": True, "patterns": TRACKER_PATTERNS},
+    "full": {"images": True, "eager": True, "patterns": MEDIA_PATTERNS + TRACKER_PATTERNS},
+}
+# CHROME_BLOCK_PROFILE picks a profile; CHROME_BLOCK_EXTRA adds comma-separated URL patterns
+BLOCK_PROFILE = os.getenv("CHROME_BLOCK_PROFILE", "full")
+EXTRA_BLOCK_PATTERNS = [p.strip() for p in os.getenv("CHROME_BLOCK_EXTRA", "").split(",") if p.strip()]
+
+# Per-station bytes/requests per profile, so savings can be compared with "off"
+BLOCK_REPORT_PATH = os.getenv("CHROME_BLOCK_REPORT_PATH", "logs/block_report.json")
+BLOCK_REPORT = os.getenv("CHROME_BLOCK_REPORT", "1") != "0"
+
+_report_lock = threading.Lock()
+
+
+def block_profile(name=None):
+    name = name or BLOCK_PROFILE
+    if name not in BLOCK_PROFILES:
+        logging.warning(f"Unknown block profile '{name}', using 'off'.")
+        name = "off"
+    profile = dict(BLOCK_PROFILES[name], name=name)
+    profile["patterns"] = profile["patterns"] + EXTRA_BLOCK_PATTERNS
+    return profile
+
+
+# Count requests, transferred bytes and blocked requests from the performance log
+def page_weight(driver):
+    weight = {"requests": 0, "bytes": 0, "blocked": 0}
+    for entry in driver.get_log("performance"):
+        message = json.loads(entry["message"])["message"]
+        method = message.get("method")
+        if method == "Network.requestWillBeSent":
+            weight["requests"] += 1
+        elif method == "Network.loadingFinished":
+            weight["bytes"] += int(message["params"].get("encodedDataLength", 0))
+        elif method == "Network.loadingFailed" and message["params"].get("blockedReason"):
+            weight["blocked"] += 1
+    return weight
+
+
+def record_page_weight(station, profile, weight):
+    with _report_lock:
+        try:
+            with open(BLOCK_REPORT_PATH, "r", encoding="utf-8") as f:
+                report = json.load(f)
+        except (FileNotFoundError, ValueError):
+            report = {}
+        entry = report.setdefault(station, {})
+        entry[profile] = dict(weight, measured=datetime.now().isoformat(timespec="seconds"))
+        os.makedirs(os.path.dirname(BLOCK_REPORT_PATH) or ".", exist_ok=True)
+        tmp_path = f"{BLOCK_REPORT_PATH}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, BLOCK_REPORT_PATH)
+
+    baseline = entry.get("off")
+    if baseline and profile != "off":
+        logging.info(
+            f"[{station}] block profile '{profile}': {weight['requests']} requests / {weight['bytes'] // 1024} KB, "
+            f"saved {baseline['requests'] - weight['requests']} requests / "
+            f"{(baseline['bytes'] - weight['bytes']) // 1024} KB vs no blocking"
+        )
+    else:
+        logging.info(f"[{station}] block profile '{profile}': {weight['requests']} requests / "
+                     f"{weight['bytes'] // 1024} KB, {weight['blocked']} blocked")
+
+
+def build_chrome_options(headless=True, binary_location=None, performance_log=False, profile=None):
+    profile = profile or block_profile("off")
+    options = Options()
+    if headless:
+        options.add_argument('--headless=new')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--window-size=1920,3000')
+    if binary_location:
+        options.binary_location = binary_location
+    if profile["images"]:
+        options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    if profile["eager"]:
+        # Return from driver.get() at DOMContentLoaded; the scrapers wait on their own conditions
+        options.page_load_strategy = 'eager'
+    if performance_log:
+        # Network events for endpoint discovery and the block report (driver.get_log("performance"))
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    return options
+
+
+class ChromePool:
+    def __init__(self, size=1, max_pages=MAX_PAGES_PER_DRIVER, headless=None,
+                 binary_location=None, driver_path=None, performance_log=None, block=None):
+        if headless is None:
+            headless = os.getenv("CHROME_HEADLESS", "1") != "0"
+        self.size = max(1, size)
+        self.max_pages = max_pages
+        self.headless = headless
+        self.binary_location = binary_location or configured_path("CHROME_BINARY", LOCAL_CHROME_BINARIES)
+        self.driver_path = driver_path or configured_path("CHROMEDRIVER_PATH", LOCAL_CHROMEDRIVERS)
+        self.profile = block_profile(block)
+        self.performance_log = BLOCK_REPORT if performance_log is None else performance_log
+
+        self._idle = queue.LifoQueue()
+        self._pages = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        atexit.register(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _start_driver(self):
+        started = time.perf_counter()
+        options = build_chrome_options(self.headless, self.binary_location, self.performance_log, self.profile)
+        if self.driver_path:
+            driver = webdriver.Chrome(service=Service(self.driver_path), options=options)
+        else:
+            driver = webdriver.Chrome(options=options)
+        logging.info("Chrome started in %.2fs", time.perf_counter() - started)
+        return driver
+
+    def _acquire(self):
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("ChromePool is closed.")
+                try:
+                    return self._idle.get_nowait()
+                except queue.Empty:
+                    pass
+                if len(self._pages) < self.size:
+                    # Reserve the slot before the (slow) start so other
+                    # threads do not overshoot the pool size.
+                    placeholder = object()
+                    self._pages[placeholder] = 0
+                    break
+            # Every browser is busy; wait for one to come back. The timeout
+            # lets us notice a slot freed by a recycled browser.
+            try:
+                return self._idle.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+        try:
+            driver = self._start_driver()
+        finally:
+            with self._lock:
+                self._pages.pop(placeholder, None)
+        with self._lock:
+            self._pages[driver] = 0
+        return driver
+
+    def _discard(self, driver):
+        with self._lock:
+            self._pages.pop(driver, None)
+        try:
+            driver.quit()
+        except Exception as e:
+            logging.warning(f"Failed to quit Chrome cleanly: {e}")
+
+    def _release(self, driver, base_handle, healthy):
+        with self._lock:
+            self._pages[driver] = self._pages.get(driver, 0) + 1
+            worn_out = self._pages[driver] >= self.max_pages
+            closed = self._closed
+
+        if not healthy or worn_out or closed:
+            reason = "crashed" if not healthy else "reached page limit" if worn_out else "pool closed"
+            logging.info(f"Recycling Chrome driver ({reason}).")
+            self._discard(driver)
+            return
+
+        try:
+            for handle in driver.window_handles:
+                if handle != base_handle:
+                    driver.switch_to.window(handle)
+                    driver.close()
+            driver.switch_to.window(base_handle)
+        except WebDriverException as e:
+            logging.warning(f"Failed to close tab, recycling Chrome driver: {e}")
+            self._discard(driver)
+            return
+        self._idle.put(driver)
+
+    # Blocked URL patterns are per page target, so they are set on every new tab
+    def _prepare_tab(self, driver):
+        if self.profile["patterns"]:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": self.profile["patterns"]})
+        if self.performance_log:
+            driver.get_log("performance")  # start the tab with an empty log
+
+    # Hand out a fresh tab on a warm browser; the tab is closed afterwards and
+    # the browser goes back to the pool (or is recycled if it misbehaved).
+    # `station` labels the tab in the resource block report.
+    @contextmanager
+    def tab(self, station=None):
+        driver = self._acquire()
+        healthy = True
+        try:
+            base_handle = driver.current_window_handle
+            driver.switch_to.new_window('tab')
+            self._prepare_tab(driver)
+        except WebDriverException:
+            self._discard(driver)
+            raise
+
+        try:
+            yield driver
+        except TimeoutException:
+            # A slow page, not a broken browser: keep it in the pool
+            raise
+        except WebDriverException:
+            healthy = False
+            raise
+        finally:
+            if healthy and self.performance_log:
+                try:
+                    weight = page_weight(driver)
+                    if station:
+                        record_page_weight(station, self.profile["name"], weight)
+                except Exception as e:
+                    logging.warning(f"Failed to measure page weight: {e}")
+            self._release(driver, base_handle, healthy)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+# Process-wide pool shared by scrapers that are not handed one explicitly,
+# so running several stations in one process reuses the same browser.
+def default_pool():
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None or _default_pool._closed:
+            _default_pool = ChromePool()
+        return _default_pool
+
+
+@contextmanager
+def chrome_tab(pool=None, station=None):
+    with (pool or default_pool()).tab(station) as driver:
+        yield driver
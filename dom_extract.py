@@ -0,0 +1,136 @@
+# dom_extract.py
+# Pull every chart row out of the page with a single execute_script call
+# instead of one WebDriver round trip per find_element.
+#
+#   python dom_extract.py eightfm     # benchmark against the per-row path
+
+import sys
+import json
+import time
+import logging
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import TimeoutException
+
+from chrome_pool import chrome_tab
+from page_ready import wait_until, rows_stable, enter_frame
+
+# Per-station CSS selectors: one row element, and rank/title/artist inside it.
+# A rank of None means the row position is the rank.
+STATION_SPECS = {
+    "myfm": {
+        "url": "https://my.syok.my/charts/my-fm-music-chart-2025",
+        "home": "https://my.syok.my",
+        "link": "charts/my-fm-music-chart",
+        "row": "li.chart-listing--items",
+        "rank": "span.chart-listing--position",
+        "title": "h2.chart-listing--song",
+        "artist": "h6.chart-listing--artist",
+    },
+    "myfm_list": {
+        "url": "https://my.syok.my/charts/my-fm-music-chart-2025",
+        "row": ".music-chart-list li",
+        "rank": None,
+        "title": ".music-chart-song-title",
+        "artist": ".music-chart-song-artist",
+    },
+    "988": {
+        "url": "https://988.com.my/music_chart/",
+        "row": "div.song-container",
+        "rank": "p.ranking-text",
+        "title": "p.song-title.music-chart-song-title",
+        "artist": "p.artist-name",
+    },
+    "988_list": {
+        "url": "https://988.com.my/music_chart/",
+        "row": ".music_chart_list .music_chart_content",
+        "rank": None,
+        "title": ".music_chart_title",
+        "artist": ".music_chart_singer",
+    },
+    "eightfm": {
+        "url": "https://www.eight.audio/eight-fm-20好听榜/",
+        "frame": "iframe",
+        "row": ".song-wrapper",
+        "rank": ".song-index-num",
+        "title": ".song-detail-name",
+        "artist": ".song-detail-artist",
+    },
+    "eightfm_cards": {
+        "url": "https://www.eight.audio/",
+        "row": ".chart-card",
+        "rank": None,
+        "title": ".chart-card-title",
+        "artist": ".chart-card-singer",
+    },
+}
+
+EXTRACT_ROWS_JS = """
+const spec = arguments[0];
+const text = (row, selector) => {
+    if (!selector) return null;
+    const el = row.querySelector(selector);
+    return el ? (el.innerText || el.textContent || "").trim() : null;
+};
+return Array.from(document.querySelectorAll(spec.row)).map((row, i) => ({
+    position: i + 1,
+    rank: text(row, spec.rank),
+    title: text(row, spec.title),
+    artist: text(row, spec.artist)
+}));
+"""
+
+
+# All rows as [{"position", "rank", "title", "artist"}] in one round trip.
+# Values are raw strings (None when the selector did not match); callers keep
+# their own parsing rules.
+def extract_rows(driver, spec):
+    selectors = {key: spec.get(key) for key in ("row", "rank", "title", "artist")}
+    return driver.execute_script(EXTRACT_ROWS_JS, selectors) or []
+
+
+# The previous extraction path: one find_element per field per row
+def extract_rows_per_element(driver, spec):
+    rows = []
+    for i, elem in enumerate(driver.find_elements(By.CSS_SELECTOR, spec["row"]), 1):
+        row = {"position": i}
+        for key in ("rank", "title", "artist"):
+            selector = spec.get(key)
+            try:
+                row[key] = elem.find_element(By.CSS_SELECTOR, selector).text.strip() if selector else None
+            except Exception:
+                row[key] = None
+        rows.append(row)
+    return rows
+
+
+def benchmark_extraction(driver, spec, repeat=3):
+    results = {}
+    for name, extract in (("execute_script", extract_rows), ("find_element", extract_rows_per_element)):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rows = extract(driver, spec)
+            timings.append(time.perf_counter() - started)
+        results[name] = {"rows": len(rows), "best_seconds": round(min(timings), 4)}
+    fields = sum(1 for key in ("rank", "title", "artist") if spec.get(key))
+    results["find_element"]["round_trips"] = 1 + results["find_element"]["rows"] * fields
+    results["execute_script"]["round_trips"] = 1
+    return results
+
+
+def main(station):
+    spec = STATION_SPECS[station]
+    with chrome_tab() as driver:
+        driver.get(spec["url"])
+        if spec.get("frame"):
+            try:
+                enter_frame(driver, (By.CSS_SELECTOR, spec["frame"]), 15, f"{station} iframe")
+            except TimeoutException:
+                logging.warning("No chart iframe found, benchmarking the top document.")
+        wait_until(driver, rows_stable((By.CSS_SELECTOR, spec["row"])), 30, f"{station} chart rows stable")
+        print(json.dumps(benchmark_extraction(driver, spec), indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    main(sys.argv[1] if len(sys.argv) > 1 else "eightfm")
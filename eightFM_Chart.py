@@ -1,80 +1,87 @@
-import os
-import json
-import time
 import logging
 from datetime import datetime
 from dotenv import load_dotenv
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+
+from blogger_client import get_client, weekly_post
+from chart_analytics import apply_snapshot
+from chart_render import render
+from change_detect import chart_fingerprint, is_unchanged, mark_done, publish_if_changed
+from chrome_pool import chrome_tab
+from dom_extract import extract_rows, STATION_SPECS
+from http_first import fetch_station_rows
+from snapshot_store import save_snapshot, load_snapshot
+from page_ready import wait_until, network_idle, enter_frame, rows_stable
 
 load_dotenv()
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-def scrape_eightfm_chart():
-    url = "https://www.eight.audio/eight-fm-20好听榜/"
-    output_path = os.getenv("EIGHT_LOCATION")
+def fetch_eightfm_rows_browser(pool=None):
+    url = STATION_SPECS["eightfm"]["url"]
 
-    if not output_path:
-        raise ValueError("Environment variable 'EIGHT_LOCATION' is not set.")
+    # Browser comes from the shared Chrome pool (set CHROME_HEADLESS=0 to watch it for debugging)
+    with chrome_tab(pool, "eightfm") as driver:
+        logging.info("Opening EIGHT FM chart page...")
+        driver.get(url)
 
-    # Setup Selenium
-    options = Options()
-    HEADLESS = False  # Set to False to run browser in non-headless mode for debugging
-    if HEADLESS:
-        options.add_argument("--headless")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--window-size=1920,3000")
-    driver = webdriver.Chrome(options=options)
-
-    logging.info("Opening EIGHT FM chart page...")
-    driver.get(url)
+        try:
+            # Wait for today-list-wrapper elements to appear
+            wait_until(driver, EC.presence_of_element_located((By.CLASS_NAME, "today-list-wrapper")),
+                       30, "EIGHT FM today-list-wrapper")
+        except Exception as e:
+            logging.warning(f"Wait for today-list-wrapper failed: {e}")
+            logging.info("Falling back to wait for body element...")
+            try:
+                wait_until(driver, EC.presence_of_element_located((By.TAG_NAME, "body")), 30, "EIGHT FM body")
+            except Exception as e2:
+                logging.error(f"Wait for body element also failed: {e2}")
+
+        # Let the page finish fetching what it needs to render the chart
+        try:
+            wait_until(driver, network_idle(), 10, "EIGHT FM network idle")
+        except TimeoutException:
+            logging.info("Network did not go idle, continuing with what has loaded.")
+
+        # Check for iframes and switch to first iframe if present
+        iframes = driver.find_elements(By.TAG_NAME, "iframe")
+        if iframes:
+            logging.info(f"Found {len(iframes)} iframe(s), switching to the first one.")
+            try:
+                enter_frame(driver, iframes[0], 15, "EIGHT FM iframe")
+            except TimeoutException:
+                logging.warning("Iframe document did not become ready in time.")
+        else:
+            logging.info("No iframes found on the page.")
 
-    try:
-        # Wait for today-list-wrapper elements to appear
-        WebDriverWait(driver, 30).until(
-            EC.presence_of_element_located((By.CLASS_NAME, "today-list-wrapper"))
-        )
-    except Exception as e:
-        logging.warning(f"Wait for today-list-wrapper failed: {e}")
-        logging.info("Falling back to wait for body element...")
         try:
-            WebDriverWait(driver, 30).until(
-                EC.presence_of_element_located((By.TAG_NAME, "body"))
-            )
-        except Exception as e2:
-            logging.error(f"Wait for body element also failed: {e2}")
-
-    time.sleep(2)  # Additional wait for full rendering
-
-    # Check for iframes and switch to first iframe if present
-    iframes = driver.find_elements(By.TAG_NAME, "iframe")
-    if iframes:
-        logging.info(f"Found {len(iframes)} iframe(s), switching to the first one.")
-        driver.switch_to.frame(iframes[0])
-        time.sleep(5)  # Wait after switching to iframe
-    else:
-        logging.info("No iframes found on the page.")
-
-    # Save screenshot for debugging
-    screenshot_path = "debug_screenshot.png"
-    driver.save_screenshot(screenshot_path)
-    logging.info(f"Saved screenshot to {screenshot_path}")
-
-    chart_elements = driver.find_elements(By.CLASS_NAME, "song-wrapper")
-    logging.info(f"Found {len(chart_elements)} song-wrapper elements.")
+            wait_until(driver, rows_stable((By.CLASS_NAME, "song-wrapper")), 15, "EIGHT FM chart rows stable")
+        except TimeoutException:
+            logging.warning("Chart rows did not appear, parsing whatever is on the page.")
+
+        # Save screenshot for debugging
+        screenshot_path = "debug_screenshot.png"
+        driver.save_screenshot(screenshot_path)
+        logging.info(f"Saved screenshot to {screenshot_path}")
+
+        # All rows in one execute_script round trip
+        return extract_rows(driver, STATION_SPECS["eightfm"])
+
+def scrape_eightfm_chart(pool=None):
+    rows, path = fetch_station_rows("eightfm", lambda: fetch_eightfm_rows_browser(pool))
+    logging.info(f"Found {len(rows)} song-wrapper elements via {path}.")
     chart_data = []
 
-    for i, elem in enumerate(chart_elements):
+    for i, row in enumerate(rows):
         try:
-            rank = elem.find_element(By.CLASS_NAME, "song-index-num").text.strip()
-            song = elem.find_element(By.CLASS_NAME, "song-detail-name").text.strip()
-            artist = elem.find_element(By.CLASS_NAME, "song-detail-artist").text.strip()
+            rank = row["rank"]
+            song = row["title"]
+            artist = row["artist"]
+            if song is None or artist is None:
+                raise ValueError("missing song name or artist")
             logging.info(f"Entry {i+1}: rank={rank}, song={song}, artist={artist}")
             chart_data.append({
                 "rank": int(rank),
@@ -91,63 +98,70 @@ def scrape_eightfm_chart():
         "chart": chart_data
     }
 
-    filename = f"eightfm_{datetime.now().strftime('%Y%m%d')}.json"
-    full_path = os.path.join(output_path, filename)
+    # An empty scrape must not replace today's snapshot
+    if not chart_data:
+        logging.warning("EIGHT FM chart is empty, not saving a snapshot.")
+        return chart_json
 
-    with open(full_path, "w", encoding="utf-8") as f:
-        json.dump(chart_json, f, ensure_ascii=False, indent=2)
+    fingerprint = chart_fingerprint(chart_json)
+    if is_unchanged("eightfm", "write", fingerprint):
+        return chart_json
 
-    logging.info(f"✅ Chart saved to {full_path} with {len(chart_data)} entries.")
+    try:
+        digest = save_snapshot("eightfm", chart_json, source=path)
+        mark_done("eightfm", "write", fingerprint)
+    except Exception as e:
+        logging.error(f"Failed to save snapshot: {e}")
+        return chart_json
+    try:
+        apply_snapshot("eightfm")
+    except Exception as e:
+        logging.warning(f"Failed to update trend stats: {e}")
+
+    logging.info(f"✅ Chart snapshot {digest[:12]} saved with {len(chart_data)} entries.")
 
-    driver.quit()
+    return chart_json
 
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from google.oauth2.credentials import Credentials
 
-def upload_to_blogger():
-    TOKEN_PATH = "token.json"
-    BLOGGER_CLIENT_SECRET = os.getenv("BLOGGER_CLIENT_SECRET") or "client_secret.json"
-    BLOG_ID = os.getenv("BLOG_ID")
-    if not BLOG_ID:
+# chart_data defaults to today's stored snapshot
+def blog_post(chart_data=None):
+    client = get_client()
+    if not client.blog_id:
         raise ValueError("Environment variable 'BLOG_ID' is not set.")
 
-    creds = None
-    if os.path.exists(TOKEN_PATH):
-        creds = Credentials.from_authorized_user_file(TOKEN_PATH, ['https://www.googleapis.com/auth/blogger'])
-    else:
-        flow = InstalledAppFlow.from_client_secrets_file(BLOGGER_CLIENT_SECRET, scopes=['https://www.googleapis.com/auth/blogger'])
-        creds = flow.run_local_server(port=8080)
-        with open(TOKEN_PATH, 'w') as token:
-            token.write(creds.to_json())
+    if chart_data is None:
+        DATE_STR = datetime.now().strftime("%Y-%m-%d")
+        rows = load_snapshot("eightfm", DATE_STR)
+        if not rows:
+            logging.error(f"Failed to load chart data: no EIGHT FM snapshot for {DATE_STR}")
+            return None
+        chart_data = {
+            "date": DATE_STR,
+            "chart": [{"rank": r["rank"], "song": r["title"], "artist": r["artist"]} for r in rows]
+        }
 
-    service = build('blogger', 'v3', credentials=creds)
+    content = render(chart_data["chart"], "cards", theme="eightfm",
+                     heading=f"EIGHT FM 20好听榜 - {chart_data['date']}")
 
-    output_path = os.getenv("EIGHT_LOCATION")
-    DATE_STR = datetime.now().strftime("%Y%m%d")
-    json_path = os.path.join(output_path, f"eightfm_{DATE_STR}.json")
-
-    try:
-        with open(json_path, "r", encoding="utf-8") as f:
-            chart_data = json.load(f)
-    except Exception as e:
-        logging.error(f"Failed to load chart data: {e}")
-        return
+    title = f"EIGHT FM Chart - {chart_data['date']}"
+    return weekly_post(client, "eightfm", title, content)
 
-    content = "<h2>EIGHT FM 20好听榜 - {}</h2>".format(chart_data['date'])
-    for item in chart_data["chart"]:
-        content += f"<p><b>{item['rank']}. {item['song']}</b><br><i>{item['artist']}</i></p>"
 
-    title = f"EIGHT FM Chart - {chart_data['date']}"
+def upload_to_blogger(chart_data=None):
+    post = blog_post(chart_data)
+    if not post:
+        return
+    client, job = post
 
     try:
-        posts = service.posts()
-        new_post = posts.insert(blogId=BLOG_ID, body={"title": title, "content": content}, isDraft=False).execute()
+        new_post = client.upsert_post(job.key, job.title, job.content)
         logging.info(f"✅ Blog post published: {new_post.get('url')}")
+        return new_post
     except HttpError as error:
         logging.error(f"❌ Failed to publish post to Blogger: {error}")
 
 if __name__ == "__main__":
-    scrape_eightfm_chart()
-    upload_to_blogger()
+    chart_json = scrape_eightfm_chart()
+    if chart_json["chart"]:
+        publish_if_changed("eightfm", chart_json, lambda _: upload_to_blogger(chart_json))
@@ -0,0 +1,257 @@
+# endpoint_discovery.py
+# Find the JSON/XHR request a station page renders its chart from, so later
+# runs can call it directly with requests instead of driving a browser.
+#
+#   python endpoint_discovery.py 988 eightfm     # one browser run per station
+#
+# Discovery loads the page once with Chrome's performance log on, matches every
+# JSON response against the rows rendered in the DOM and stores the endpoint
+# (URL, method, headers, where the rows live in the payload) in ENDPOINTS_PATH.
+
+import os
+import sys
+import json
+import logging
+import threading
+from datetime import datetime
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from change_detect import conditional_get, parse_cached
+from chrome_pool import ChromePool
+from dom_extract import STATION_SPECS, extract_rows
+from http_client import request
+from page_ready import wait_until, rows_stable, enter_frame, network_idle, link_present
+
+ENDPOINTS_PATH = os.getenv("CHART_ENDPOINTS_PATH", "logs/chart_endpoints.json")
+HTTP_TIMEOUT = 15
+# Request headers worth replaying; cookies and browser internals are left out
+REPLAY_HEADERS = {"accept", "content-type", "origin", "referer", "user-agent", "x-requested-with"}
+
+_endpoints_lock = threading.Lock()
+
+
+# === Stored endpoints ===
+def load_endpoints():
+    try:
+        with open(ENDPOINTS_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_endpoint(station, endpoint):
+    with _endpoints_lock:
+        endpoints = load_endpoints()
+        if endpoint is None:
+            endpoints.pop(station, None)
+        else:
+            endpoints[station] = endpoint
+        os.makedirs(os.path.dirname(ENDPOINTS_PATH) or ".", exist_ok=True)
+        tmp_path = f"{ENDPOINTS_PATH}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(endpoints, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, ENDPOINTS_PATH)
+
+
+# === Walking JSON payloads ===
+def flatten(item, prefix="", depth=3):
+    flat = {}
+    for key, value in item.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict) and depth > 1:
+            flat.update(flatten(value, f"{path}.", depth - 1))
+        elif isinstance(value, (str, int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+# Every list of objects in the payload, with the path that leads to it
+def object_lists(payload, path=()):
+    if isinstance(payload, list):
+        if payload and all(isinstance(item, dict) for item in payload):
+            yield list(path), payload
+        for i, item in enumerate(payload[:1]):
+            yield from object_lists(item, path + (i,))
+    elif isinstance(payload, dict):
+        for key, value in payload.items():
+            yield from object_lists(value, path + (key,))
+
+
+def follow(payload, path):
+    for key in path:
+        payload = payload[key]
+    return payload
+
+
+def best_field(flat_items, wanted):
+    counts = {}
+    for flat in flat_items:
+        for key, value in flat.items():
+            if str(value).strip() in wanted:
+                counts[key] = counts.get(key, 0) + 1
+    if not counts:
+        return None, 0
+    key = max(counts, key=counts.get)
+    return key, counts[key]
+
+
+# Locate the rows inside `payload` that match what the page rendered. Returns
+# {"items_path", "fields"} or None.
+def match_chart_payload(payload, dom_rows):
+    titles = {row["title"] for row in dom_rows if row.get("title")}
+    artists = {row["artist"] for row in dom_rows if row.get("artist")}
+    ranks = {str(row.get("rank") or row["position"]) for row in dom_rows}
+    best = None
+    for path, items in object_lists(payload):
+        flat_items = [flatten(item) for item in items]
+        title_key, hits = best_field(flat_items, titles)
+        if not title_key or hits < max(1, len(titles) // 2):
+            continue
+        if best and hits <= best[0]:
+            continue
+        artist_key, _ = best_field(flat_items, artists)
+        rank_key, rank_hits = best_field(flat_items, ranks)
+        best = (hits, {
+            "items_path": path,
+            "fields": {
+                "title": title_key,
+                "artist": artist_key,
+                # None: no rank field, rows are ranked by list order
+                "rank": rank_key if rank_hits >= hits // 2 else None,
+            },
+        })
+    return best[1] if best else None
+
+
+# === Direct fetch of a discovered endpoint ===
+# Same row shape as dom_extract.extract_rows; None when no endpoint is known
+# or it no longer returns the chart. A GET endpoint answering 304 returns the
+# rows parsed from it last time without decoding the payload again.
+def fetch_endpoint_rows(station):
+    endpoint = load_endpoints().get(station)
+    if not endpoint:
+        return None
+    try:
+        if endpoint["method"] == "GET" and not endpoint.get("post_data"):
+            body, not_modified = conditional_get(endpoint["url"], endpoint.get("headers"), HTTP_TIMEOUT)
+            variant = json.dumps([endpoint["items_path"], endpoint["fields"]])
+            rows = parse_cached(endpoint["url"], body, not_modified,
+                                lambda body: payload_rows(json.loads(body), endpoint), variant)
+        else:
+            res = request(endpoint["method"], endpoint["url"], headers=endpoint.get("headers"),
+                          data=endpoint.get("post_data"), timeout=HTTP_TIMEOUT)
+            res.raise_for_status()
+            rows = payload_rows(res.json(), endpoint)
+    except Exception as e:
+        logging.info(f"[{station}] chart endpoint failed: {e}")
+        return None
+
+    # Rows the station scripts would drop anyway: let the HTML/browser path run
+    if not any(row["title"] and row["artist"] for row in rows):
+        logging.info(f"[{station}] chart endpoint rows have no titles/artists, ignoring it.")
+        return None
+    return rows
+
+
+def payload_rows(payload, endpoint):
+    items = follow(payload, endpoint["items_path"])
+    fields = endpoint["fields"]
+    rows = []
+    for i, item in enumerate(items, 1):
+        flat = flatten(item) if isinstance(item, dict) else {}
+        row = {"position": i}
+        for key in ("rank", "title", "artist"):
+            value = flat.get(fields[key]) if fields.get(key) else None
+            row[key] = str(value).strip() if value is not None else None
+        # No rank field in the payload: the list order is the chart order
+        if not fields.get("rank"):
+            row["rank"] = str(i)
+        rows.append(row)
+    return rows
+
+
+# === Discovery (one browser run) ===
+def network_responses(driver):
+    requests_by_id = {}
+    responses = []
+    for entry in driver.get_log("performance"):
+        message = json.loads(entry["message"])["message"]
+        params = message.get("params", {})
+        if message.get("method") == "Network.requestWillBeSent":
+            requests_by_id[params["requestId"]] = params["request"]
+        elif message.get("method") == "Network.responseReceived":
+            response = params["response"]
+            if "json" in response.get("mimeType", "") or params.get("type") in ("XHR", "Fetch"):
+                responses.append((params["requestId"], response["url"]))
+
+    for request_id, url in responses:
+        try:
+            body = driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+            payload = json.loads(body["body"])
+        except (WebDriverException, ValueError, KeyError):
+            continue
+        yield requests_by_id.get(request_id, {"url": url, "method": "GET"}), payload
+
+
+def open_chart_page(driver, spec):
+    if spec.get("home"):
+        driver.get(spec["home"])
+        try:
+            link = wait_until(driver, link_present(spec["link"]), 15, "chart link")
+        except TimeoutException:
+            link = None
+        driver.get(link or spec["url"])
+    else:
+        driver.get(spec["url"])
+    if spec.get("frame"):
+        try:
+            enter_frame(driver, (By.CSS_SELECTOR, spec["frame"]), 15, "chart iframe")
+        except TimeoutException:
+            logging.info("No chart iframe found, reading the top document.")
+
+
+def discover_endpoint(station, pool):
+    spec = STATION_SPECS[station]
+    with pool.tab() as driver:
+        open_chart_page(driver, spec)
+        wait_until(driver, rows_stable((By.CSS_SELECTOR, spec["row"])), 30, f"{station} chart rows stable")
+        try:
+            wait_until(driver, network_idle(), 10, f"{station} network idle")
+        except TimeoutException:
+            pass
+        dom_rows = extract_rows(driver, spec)
+
+        for req, payload in network_responses(driver):
+            match = match_chart_payload(payload, dom_rows)
+            if not match:
+                continue
+            headers = {k: v for k, v in req.get("headers", {}).items() if k.lower() in REPLAY_HEADERS}
+            endpoint = {
+                "url": req["url"],
+                "method": req.get("method", "GET"),
+                "headers": headers,
+                "post_data": req.get("postData"),
+                "discovered": datetime.now().isoformat(timespec="seconds"),
+                **match,
+            }
+            save_endpoint(station, endpoint)
+            logging.info(f"[{station}] chart endpoint found: {endpoint['method']} {endpoint['url']}")
+            return endpoint
+
+    logging.warning(f"[{station}] no JSON response carried the chart rows.")
+    return None
+
+
+def main(stations):
+    with ChromePool(performance_log=True) as pool:
+        for station in stations:
+            try:
+                discover_endpoint(station, pool)
+            except Exception as e:
+                logging.error(f"[{station}] discovery failed: {e}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    main(sys.argv[1:] or ["myfm", "988", "eightfm"])
@@ -0,0 +1,101 @@
+# http_client.py
+# Shared HTTP layer for every outbound call (station pages, chart endpoints,
+# Spotify, YouTube).
+#
+# One requests.Session per process keeps connections alive and pools them per
+# host, so repeat calls to the same host reuse the TLS connection. Every call
+# gets a default timeout and retries 429/5xx with exponential backoff
+# (honouring Retry-After). Per-host metrics (requests, errors, bytes, latency
+# histogram) are kept in memory; log_metrics() reports them at the end of a run.
+#
+#   from http_client import get
+#   res = get(url, headers=HEADERS)
+
+import time
+import logging
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_TIMEOUT = (5, 20)  # (connect, read) seconds
+POOL_SIZE = 20
+RETRY = Retry(
+    total=3,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10)
+
+_session = None
+_session_lock = threading.Lock()
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=RETRY)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+# === Metrics ===
+def record(host, elapsed, size=0, status=None, error=False):
+    with _metrics_lock:
+        m = _metrics.setdefault(host, {
+            "requests": 0, "errors": 0, "bytes": 0, "seconds": 0.0,
+            "status": {}, "latency": [0] * (len(LATENCY_BUCKETS) + 1),
+        })
+        m["requests"] += 1
+        m["errors"] += int(error or (status is not None and status >= 400))
+        m["bytes"] += size
+        m["seconds"] += elapsed
+        if status is not None:
+            m["status"][str(status)] = m["status"].get(str(status), 0) + 1
+        bucket = next((i for i, limit in enumerate(LATENCY_BUCKETS) if elapsed <= limit), len(LATENCY_BUCKETS))
+        m["latency"][bucket] += 1
+
+
+def metrics():
+    with _metrics_lock:
+        return {host: {**m, "status": dict(m["status"]), "latency": list(m["latency"])} for host, m in _metrics.items()}
+
+
+def log_metrics(log=logging.info):
+    labels = [f"<={limit}s" for limit in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1]}s"]
+    for host, m in sorted(metrics().items()):
+        histogram = ", ".join(f"{label}: {n}" for label, n in zip(labels, m["latency"]) if n)
+        log(f"[http] {host}: {m['requests']} requests, {m['errors']} errors, "
+            f"{m['bytes'] // 1024} KB, avg {m['seconds'] / m['requests']:.2f}s ({histogram})")
+
+
+# === Requests ===
+def request(method, url, **kwargs):
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    host = urlsplit(url).hostname
+    started = time.perf_counter()
+    try:
+        res = session().request(method, url, **kwargs)
+    except requests.RequestException:
+        record(host, time.perf_counter() - started, error=True)
+        raise
+    size = len(res.content) if not kwargs.get("stream") else int(res.headers.get("Content-Length", 0))
+    record(host, time.perf_counter() - started, size, res.status_code)
+    return res
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
@@ -0,0 +1,171 @@
+# http_first.py
+# HTTP-first chart fetching: try a plain requests + BeautifulSoup fetch of the
+# station page and only launch Chrome when the static HTML has no chart rows.
+# The path that worked is remembered per station so later runs go straight to it.
+# Stations with a discovered JSON endpoint (endpoint_discovery.py) skip HTML too.
+
+import os
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import urljoin
+from bs4 import BeautifulSoup
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import TimeoutException
+
+from change_detect import conditional_get, parse_cached
+from chrome_pool import chrome_tab
+from dom_extract import STATION_SPECS, extract_rows
+from endpoint_discovery import fetch_endpoint_rows
+from page_ready import wait_until, rows_stable, enter_frame
+
+STRATEGY_PATH = os.getenv("FETCH_STRATEGY_PATH", "logs/fetch_strategy.json")
+# Stations pinned to the browser get their static HTML re-checked this often
+RECHECK_DAYS = 7
+HTTP_TIMEOUT = 15
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/126.0 Safari/537.36"
+}
+
+_strategy_lock = threading.Lock()
+
+
+# === Remembered fetch path per station ===
+def load_strategies():
+    try:
+        with open(STRATEGY_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def remember_path(station, path):
+    with _strategy_lock:
+        strategies = load_strategies()
+        strategies[station] = {"path": path, "checked": datetime.now().isoformat(timespec="seconds")}
+        os.makedirs(os.path.dirname(STRATEGY_PATH) or ".", exist_ok=True)
+        tmp_path = f"{STRATEGY_PATH}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(strategies, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, STRATEGY_PATH)
+
+
+def preferred_path(station):
+    entry = load_strategies().get(station)
+    if not entry:
+        return "http"
+    if entry["path"] == "browser":
+        checked = datetime.fromisoformat(entry["checked"])
+        if datetime.now() - checked > timedelta(days=RECHECK_DAYS):
+            return "http"
+    return entry["path"]
+
+
+# === Static HTML path ===
+# Conditional GET: an unchanged page is revalidated (304) instead of re-downloaded,
+# and what was parsed from it last time is reused (change_detect.parse_cached)
+def fetch_parsed(url, parse, variant=""):
+    html, not_modified = conditional_get(url, HEADERS, HTTP_TIMEOUT)
+    return parse_cached(url, html, not_modified, parse, variant)
+
+
+def chart_link(html, spec):
+    soup = BeautifulSoup(html, "html.parser")
+    for link in soup.find_all("a", href=True):
+        if spec["link"] in link["href"]:
+            return link["href"]
+    return None
+
+
+# Stations whose chart URL changes (e.g. yearly) are found through their homepage
+def chart_url(spec):
+    if not spec.get("home"):
+        return spec["url"]
+    link = fetch_parsed(spec["home"], lambda html: chart_link(html, spec), spec["link"])
+    return urljoin(spec["home"], link) if link else spec["url"]
+
+
+# Same row shape as dom_extract.extract_rows
+def parse_rows(html, spec):
+    soup = BeautifulSoup(html, "html.parser")
+    rows = []
+    for i, item in enumerate(soup.select(spec["row"]), 1):
+        row = {"position": i}
+        for key in ("rank", "title", "artist"):
+            tag = item.select_one(spec[key]) if spec.get(key) else None
+            row[key] = tag.get_text().strip() if tag else None
+        rows.append(row)
+    return rows
+
+
+# Rows on the page, or the src of the iframe the chart may live in
+def page_rows(html, spec):
+    rows = parse_rows(html, spec)
+    frame = None
+    if not rows and spec.get("frame"):
+        tag = BeautifulSoup(html, "html.parser").select_one(f"{spec['frame']}[src]")
+        frame = tag["src"] if tag else None
+    return {"rows": rows, "frame": frame}
+
+
+def http_rows(spec):
+    url = chart_url(spec)
+    selectors = json.dumps(spec, sort_keys=True)
+    page = fetch_parsed(url, lambda html: page_rows(html, spec), selectors)
+    if not page["rows"] and page["frame"]:
+        # The chart may live in an iframe; fetch its document directly
+        return fetch_parsed(urljoin(url, page["frame"]), lambda html: parse_rows(html, spec), selectors)
+    return page["rows"]
+
+
+# === Browser path (generic; stations with their own flow pass browser_fetch) ===
+def browser_rows(spec, pool=None, timeout=30, station=None):
+    with chrome_tab(pool, station) as driver:
+        driver.get(spec["url"])
+        if spec.get("frame"):
+            try:
+                enter_frame(driver, (By.CSS_SELECTOR, spec["frame"]), timeout, "chart iframe")
+            except TimeoutException:
+                logging.info("No chart iframe found, reading the top document.")
+        try:
+            wait_until(driver, rows_stable((By.CSS_SELECTOR, spec["row"])), timeout, "chart rows stable")
+        except TimeoutException:
+            return []
+        return extract_rows(driver, spec)
+
+
+# Rows for `station` as [{"position", "rank", "title", "artist"}], plus the path
+# ("api", "http" or "browser") that produced them. A chart endpoint found by
+# endpoint_discovery.py is always tried first, then the static HTML.
+# browser_fetch is the station script's own Selenium flow (its
+# fetch_*_rows_browser); it only runs when neither of those carried the rows.
+def fetch_station_rows(station, browser_fetch=None, spec=None, pool=None, min_rows=1):
+    spec = spec or STATION_SPECS[station]
+    if browser_fetch is None:
+        browser_fetch = lambda: browser_rows(spec, pool, station=station)
+
+    rows = fetch_endpoint_rows(station)
+    if rows is not None:
+        if len(rows) >= min_rows:
+            logging.info(f"[{station}] chart rows fetched from discovered endpoint ({len(rows)} rows).")
+            return rows, "api"
+        logging.info(f"[{station}] discovered endpoint returned no rows, falling back.")
+
+    if preferred_path(station) == "http":
+        try:
+            rows = http_rows(spec)
+        except Exception as e:
+            logging.info(f"[{station}] HTTP fetch failed: {e}")
+            rows = []
+        if len(rows) >= min_rows:
+            logging.info(f"[{station}] chart rows found in static HTML ({len(rows)} rows), skipping browser.")
+            remember_path(station, "http")
+            return rows, "http"
+        logging.info(f"[{station}] static HTML has no chart rows, escalating to browser.")
+        # Written only when HTTP was tried, so `checked` keeps counting towards
+        # the next HTTP recheck on the runs that go straight to the browser
+        remember_path(station, "browser")
+
+    return browser_fetch(), "browser"
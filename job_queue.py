@@ -0,0 +1,228 @@
+# job_queue.py
+# Durable SQLite job queue between the scrape, render and publish stages.
+#
+# A scrape enqueues a render job carrying the chart rows; rendering enqueues a
+# publish job carrying the finished post. Each job survives the process, so a
+# Blogger failure is retried on the next drain (this run after a backoff, or
+# the next run) from the stored post, without opening the browser again.
+#
+#   python job_queue.py stats               # queue depth and latency
+#   python job_queue.py failed              # jobs that ran out of attempts
+#   python job_queue.py retry               # put failed jobs back in the queue
+#
+# A job that fails is re-queued with exponential backoff until it has used
+# max_attempts, then kept as "failed" for inspection. A job left "running" by
+# a crashed worker is claimable again once its lease expires.
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+
+QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "logs/job_queue.db")
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 30       # seconds before the first retry, doubled per attempt
+BACKOFF_MAX = 3600
+LEASE_SECONDS = 600     # a "running" job older than this is considered abandoned
+MAX_WAIT = int(os.getenv("JOB_MAX_WAIT", "120"))  # how long drain() waits for a backoff
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id       INTEGER PRIMARY KEY,
+    queue        TEXT NOT NULL,
+    job_key      TEXT UNIQUE,
+    payload      TEXT NOT NULL,
+    status       TEXT NOT NULL,
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,
+    enqueued_at  REAL NOT NULL,
+    started_at   REAL,
+    finished_at  REAL,
+    last_error   TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (queue, status, available_at);
+"""
+
+
+def backoff(attempts):
+    return min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+
+
+class JobQueue:
+    def __init__(self, path=None):
+        self.path = path or QUEUE_PATH
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    # Add a job. A job with the same key takes the new payload and keeps its
+    # attempt count, so a job that keeps failing is still given up on after
+    # max_attempts across runs: a queued job keeps its backoff and a failed
+    # one stays failed (see retry). Only a finished ("done") job starts over.
+    # A job a worker is running right now is left alone.
+    def enqueue(self, queue, payload, key=None, delay=0, max_attempts=MAX_ATTEMPTS):
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO jobs (queue, job_key, payload, status, max_attempts, available_at, enqueued_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?) ON CONFLICT(job_key) DO UPDATE SET "
+                "queue = excluded.queue, payload = excluded.payload, max_attempts = excluded.max_attempts, "
+                "status = CASE jobs.status WHEN 'failed' THEN 'failed' ELSE 'queued' END, "
+                "attempts = CASE jobs.status WHEN 'done' THEN 0 ELSE jobs.attempts END, "
+                "available_at = CASE jobs.status WHEN 'queued' THEN MAX(jobs.available_at, excluded.available_at) "
+                "ELSE excluded.available_at END, "
+                "enqueued_at = CASE jobs.status WHEN 'done' THEN excluded.enqueued_at ELSE jobs.enqueued_at END, "
+                "started_at = NULL, "
+                "finished_at = CASE jobs.status WHEN 'failed' THEN jobs.finished_at END, "
+                "last_error = CASE jobs.status WHEN 'done' THEN NULL ELSE jobs.last_error END "
+                "WHERE jobs.status != 'running'",
+                (queue, key, json.dumps(payload, ensure_ascii=False), max_attempts, now + delay, now)
+            )
+        logging.info(f"[queue:{queue}] enqueued {key or 'job'}")
+
+    # Take the oldest ready job off `queue` and mark it running, or None
+    def claim(self, queue):
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE queue = ? AND ((status = 'queued' AND available_at <= ?) "
+                "OR (status = 'running' AND started_at < ?)) ORDER BY available_at, job_id LIMIT 1",
+                (queue, now, now - LEASE_SECONDS)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE jobs SET status = 'running', started_at = ? WHERE job_id = ?",
+                         (now, row["job_id"]))
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+    def complete(self, job):
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET status = 'done', attempts = attempts + 1, finished_at = ?, "
+                         "last_error = NULL WHERE job_id = ?", (time.time(), job["job_id"]))
+
+    def fail(self, job, error):
+        attempts = job["attempts"] + 1
+        now = time.time()
+        if attempts >= job["max_attempts"]:
+            status, available_at = "failed", now
+            logging.error(f"[queue:{job['queue']}] {job['job_key'] or job['job_id']} failed "
+                          f"after {attempts} attempts: {error}")
+        else:
+            status, available_at = "queued", now + backoff(attempts)
+            logging.warning(f"[queue:{job['queue']}] {job['job_key'] or job['job_id']} failed "
+                            f"(attempt {attempts}/{job['max_attempts']}), retrying in {backoff(attempts)}s: {error}")
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET status = ?, attempts = ?, available_at = ?, finished_at = ?, "
+                         "last_error = ? WHERE job_id = ?",
+                         (status, attempts, available_at, now, str(error)[:1000], job["job_id"]))
+
+    # Seconds until the next queued job on `queue` becomes ready (None when empty)
+    def next_ready_in(self, queue):
+        row = self.conn.execute("SELECT MIN(available_at) FROM jobs WHERE queue = ? AND status = 'queued'",
+                                (queue,)).fetchone()
+        return None if row[0] is None else max(row[0] - time.time(), 0)
+
+    # Run handler(payload, queue) for every ready job. A job whose backoff ends
+    # within max_wait seconds is waited for; later ones are left for the next run.
+    def drain(self, queue, handler, max_wait=MAX_WAIT):
+        deadline = time.time() + max_wait
+        counts = {"done": 0, "failed": 0}
+        while True:
+            job = self.claim(queue)
+            if job is None:
+                wait = self.next_ready_in(queue)
+                if wait is None or time.time() + wait > deadline:
+                    break
+                time.sleep(wait)
+                continue
+            try:
+                handler(job["payload"], self)
+            except Exception as e:
+                self.fail(job, e)
+                counts["failed"] += 1
+                continue
+            self.complete(job)
+            counts["done"] += 1
+        return counts
+
+    # === Metrics ===
+    # Per queue: depth by status, age of the oldest waiting job, and the wait
+    # (enqueue -> start) and end-to-end (enqueue -> done) latency of finished jobs
+    def stats(self):
+        now = time.time()
+        stats = {}
+        for row in self.conn.execute(
+                "SELECT queue, status, COUNT(*) AS n, MIN(enqueued_at) AS oldest FROM jobs GROUP BY queue, status"):
+            queue = stats.setdefault(row["queue"], {"queued": 0, "running": 0, "done": 0, "failed": 0})
+            queue[row["status"]] = row["n"]
+            if row["status"] == "queued":
+                queue["oldest_queued_s"] = round(now - row["oldest"], 1)
+        for row in self.conn.execute(
+                "SELECT queue, AVG(started_at - enqueued_at) AS wait, AVG(finished_at - enqueued_at) AS total, "
+                "MAX(finished_at - enqueued_at) AS worst, AVG(attempts) AS attempts "
+                "FROM jobs WHERE status = 'done' GROUP BY queue"):
+            stats[row["queue"]].update({
+                "avg_wait_s": round(row["wait"], 2),
+                "avg_latency_s": round(row["total"], 2),
+                "max_latency_s": round(row["worst"], 2),
+                "avg_attempts": round(row["attempts"], 2),
+            })
+        return stats
+
+    def log_stats(self, log=logging.info):
+        for queue, s in sorted(self.stats().items()):
+            latency = (f", avg wait {s['avg_wait_s']}s, avg latency {s['avg_latency_s']}s "
+                       f"(max {s['max_latency_s']}s), {s['avg_attempts']} attempts/job") if "avg_wait_s" in s else ""
+            log(f"[queue:{queue}] depth {s['queued']} queued, {s['running']} running, "
+                f"{s['failed']} failed, {s['done']} done{latency}")
+
+    def failed_jobs(self, queue=None):
+        rows = self.conn.execute(
+            "SELECT job_id, queue, job_key, attempts, last_error FROM jobs WHERE status = 'failed' "
+            "AND (? IS NULL OR queue = ?) ORDER BY finished_at", (queue, queue)).fetchall()
+        return [dict(row) for row in rows]
+
+    # Give failed jobs a fresh set of attempts
+    def retry_failed(self, queue=None):
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'queued', attempts = 0, available_at = ? "
+                "WHERE status = 'failed' AND (? IS NULL OR queue = ?)", (time.time(), queue, queue))
+        return cursor.rowcount
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    queue_name = sys.argv[2] if len(sys.argv) > 2 else None
+    jobs = JobQueue()
+    if command == "stats":
+        print(json.dumps(jobs.stats(), indent=2))
+    elif command == "failed":
+        print(json.dumps(jobs.failed_jobs(queue_name), indent=2, ensure_ascii=False))
+    elif command == "retry":
+        print(f"Re-queued {jobs.retry_failed(queue_name)} failed job(s)")
+    else:
+        sys.exit("usage: python job_queue.py [stats|failed|retry] [queue]")
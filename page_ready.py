@@ -0,0 +1,107 @@
+# page_ready.py
+# Event-driven readiness checks for the Selenium scrapers. Each wait returns as
+# soon as its condition holds (instead of sleeping a fixed time) and logs how
+# long it actually took.
+
+import time
+import logging
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+POLL_SECONDS = 0.1
+
+
+def wait_until(driver, condition, timeout, label):
+    started = time.perf_counter()
+    try:
+        result = WebDriverWait(driver, timeout, poll_frequency=POLL_SECONDS).until(condition)
+    except TimeoutException:
+        logging.warning(f"Wait '{label}' timed out after {time.perf_counter() - started:.2f}s")
+        raise
+    logging.info(f"Wait '{label}' ready after {time.perf_counter() - started:.2f}s")
+    return result
+
+
+def document_ready(driver):
+    try:
+        return driver.execute_script("return document.readyState") == "complete"
+    except WebDriverException:
+        return False
+
+
+# Visible modal is gone (or never showed up)
+def modal_absent(css_selector):
+    def _check(driver):
+        for element in driver.find_elements(By.CSS_SELECTOR, css_selector):
+            try:
+                if element.is_displayed():
+                    return False
+            except WebDriverException:
+                continue
+        return True
+    return _check
+
+
+# A link whose href contains `fragment` is in the DOM. Returns its href.
+# Needed after an eager driver.get(), which returns before the page's links
+# are rendered.
+def link_present(fragment):
+    def _check(driver):
+        return driver.execute_script(
+            "return Array.from(document.links).map(a => a.href).find(h => h.includes(arguments[0])) || false;",
+            fragment)
+    return _check
+
+
+# Matching rows exist and their count has not changed for `settle` seconds,
+# so lazily appended rows are not cut off. Returns the rows.
+def rows_stable(locator, min_rows=1, settle=0.5):
+    state = {"count": -1, "since": 0.0}
+
+    def _check(driver):
+        rows = driver.find_elements(*locator)
+        now = time.perf_counter()
+        if len(rows) != state["count"]:
+            state["count"] = len(rows)
+            state["since"] = now
+            return False
+        if len(rows) >= min_rows and now - state["since"] >= settle:
+            return rows
+        return False
+    return _check
+
+
+# No new network resources have been fetched for `idle` seconds and the
+# document has finished loading.
+def network_idle(idle=0.5):
+    state = {"count": -1, "since": 0.0}
+
+    def _check(driver):
+        if not document_ready(driver):
+            return False
+        count = driver.execute_script("return performance.getEntriesByType('resource').length")
+        now = time.perf_counter()
+        if count != state["count"]:
+            state["count"] = count
+            state["since"] = now
+            return False
+        return now - state["since"] >= idle
+    return _check
+
+
+# Switch into the iframe as soon as it is attachable and wait for its document
+def enter_frame(driver, locator, timeout, label="iframe"):
+    wait_until(driver, EC.frame_to_be_available_and_switch_to_it(locator), timeout, f"{label} attached")
+    wait_until(driver, document_ready, timeout, f"{label} document ready")
+
+
+# Close the modal if it is already on screen; never waits for one to appear
+def dismiss_modal(driver, close_selector, timeout=5):
+    buttons = [b for b in driver.find_elements(By.CSS_SELECTOR, close_selector) if b.is_displayed()]
+    if not buttons:
+        return False
+    buttons[0].click()
+    wait_until(driver, modal_absent(close_selector), timeout, "modal closed")
+    return True
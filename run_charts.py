@@ -0,0 +1,188 @@
+# run_charts.py
+# Single entry point: scrape every radio station concurrently, then render and
+# publish each chart that came back.
+#
+#   python run_charts.py                      # all stations, publish to Blogger
+#   python run_charts.py --stations myfm 988 --no-publish
+#   python run_charts.py --no-publish --preview previews   # every layout, one file per station
+
+import argparse
+import importlib
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from dotenv import load_dotenv
+
+from blogger_client import PublishResult, publish_posts
+from chart_analytics import annotate_chart
+from change_detect import chart_fingerprint, is_unchanged, mark_done
+from chart_render import render_all
+from chrome_pool import ChromePool
+from http_client import log_metrics
+
+load_dotenv()
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(threadName)s - %(message)s',
+    handlers=[
+        logging.FileHandler("run_charts.log"),
+        logging.StreamHandler()
+    ]
+)
+
+
+# === Per-station render stages (reuse each station script's own renderer) ===
+# Each returns (client, PostJob); publish_all sends them in one batch.
+def render_myfm(module, chart):
+    html_content = module.generate_html_table(annotate_chart("myfm", chart))
+    title = f"MY FM Music Chart - {datetime.now().strftime('%Y-%m-%d')}"
+    return module.blog_post(html_content, title)
+
+
+def render_988(module, chart):
+    html_body = module.generate_blog_body(annotate_chart("988", chart))
+    post_title = f"988 音乐排行榜 - 第 {datetime.now().strftime('%U')} 周"
+    return module.blog_post(post_title, html_body)
+
+
+def render_eightfm(module, chart):
+    post = module.blog_post(chart)
+    if not post:
+        raise RuntimeError("EIGHT FM chart could not be rendered")
+    return post
+
+
+# station -> (module, scrape function, render stage)
+STATIONS = {
+    "myfm": ("myfm_chart", "get_myfm_chart", render_myfm),
+    "988": ("988_chart", "get_988_chart", render_988),
+    "eightfm": ("eightFM_Chart", "scrape_eightfm_chart", render_eightfm),
+}
+
+
+def chart_rows(chart):
+    # eightFM wraps its rows as {"source", "date", "chart"}; the others return a bare list
+    if isinstance(chart, dict):
+        return chart.get("chart", [])
+    return chart or []
+
+
+def scrape_station(station, pool):
+    module_name, scrape_name, _ = STATIONS[station]
+    started = time.perf_counter()
+    result = {"station": station, "chart": None, "error": None}
+    try:
+        module = importlib.import_module(module_name)
+        result["chart"] = getattr(module, scrape_name)(pool=pool)
+        if not chart_rows(result["chart"]):
+            result["error"] = "empty chart"
+    except Exception as e:
+        logging.error(f"[{station}] scrape failed: {e}")
+        result["error"] = str(e)
+    result["elapsed"] = round(time.perf_counter() - started, 2)
+    logging.info(f"[{station}] scrape finished in {result['elapsed']}s ({len(chart_rows(result['chart']))} rows)")
+    return result
+
+
+# Run every station's scrape at once; the Chrome pool is sized to the worker
+# count so each concurrent scrape gets its own warm browser.
+def scrape_all(stations, workers=3):
+    workers = max(1, min(workers, len(stations)))
+    results = {}
+    with ChromePool(size=workers) as pool:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scrape") as executor:
+            futures = {executor.submit(scrape_station, station, pool): station for station in stations}
+            for future in as_completed(futures):
+                result = future.result()
+                results[result["station"]] = result
+    return {station: results[station] for station in stations}
+
+
+# Render every changed chart, then send all posts together (one Blogger batch
+# request per client) and record each station's outcome separately.
+def publish_all(results):
+    queued = {}
+    for station, result in results.items():
+        result["published"] = False
+        if result["error"]:
+            logging.warning(f"[{station}] skipping publish: {result['error']}")
+            continue
+        # Unchanged since the last published chart: skip render and post
+        fingerprint = chart_fingerprint(result["chart"])
+        if is_unchanged(station, "publish", fingerprint):
+            result["unchanged"] = True
+            continue
+        module_name, _, render = STATIONS[station]
+        try:
+            client, job = render(importlib.import_module(module_name), result["chart"])
+        except Exception as e:
+            logging.error(f"[{station}] render failed: {e}")
+            result["error"] = f"render failed: {e}"
+            continue
+        queued[station] = (client, job, fingerprint)
+
+    if not queued:
+        return
+    try:
+        posts = publish_posts([(client, job) for client, job, _ in queued.values()])
+    except Exception as e:
+        posts = {job.key: PublishResult(None, e) for _, job, _ in queued.values()}
+    for station, (_, job, fingerprint) in queued.items():
+        outcome = posts[job.key]
+        if outcome.error:
+            logging.error(f"[{station}] publish failed: {outcome.error}")
+            results[station]["error"] = f"publish failed: {outcome.error}"
+            continue
+        mark_done(station, "publish", fingerprint)
+        results[station]["published"] = True
+
+
+# Every scraped chart in every layout (table, list, cards), rendered in one
+# pass over its rows, written to <directory>/<station>.html for review
+def write_previews(results, directory):
+    os.makedirs(directory, exist_ok=True)
+    for station, result in results.items():
+        rows = chart_rows(result["chart"])
+        if not rows:
+            continue
+        pages = render_all(annotate_chart(station, rows), theme=station)
+        path = os.path.join(directory, f"{station}.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('<meta charset="utf-8">')
+            f.write("".join(f"<h3>{layout}</h3>{html}" for layout, html in pages.items()))
+        logging.info(f"[{station}] preview written to {path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape, render and publish the radio charts.")
+    parser.add_argument("--stations", nargs="+", choices=list(STATIONS), default=list(STATIONS))
+    parser.add_argument("--workers", type=int, default=len(STATIONS),
+                        help="maximum number of stations scraped at the same time")
+    parser.add_argument("--no-publish", action="store_true", help="scrape only, do not post to Blogger")
+    parser.add_argument("--preview", metavar="DIR", help="write every chart in every layout to DIR/<station>.html")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    results = scrape_all(args.stations, workers=args.workers)
+    if args.preview:
+        write_previews(results, args.preview)
+    if not args.no_publish:
+        publish_all(results)
+
+    summary = {
+        station: {k: v for k, v in result.items() if k != "chart"}
+        for station, result in results.items()
+    }
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    log_metrics()
+    logging.info(f"Run finished in {time.perf_counter() - started:.2f}s")
+    return 1 if any(result["error"] for result in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
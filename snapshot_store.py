@@ -0,0 +1,240 @@
+# snapshot_store.py
+# Indexed SQLite store for station chart snapshots, replacing the per-day
+# <station>_YYYYMMDD.json files under location/.
+#
+#   python snapshot_store.py import          # load the existing JSON files
+#   python snapshot_store.py history 988      # print one station's history
+#
+# Identical charts are stored once: each snapshot (station, date) points at a
+# content hash, and the rows live under that hash. Every write is a single
+# transaction, so a crash never leaves a half-written chart behind.
+
+import os
+import re
+import sys
+import glob
+import json
+import sqlite3
+import hashlib
+import logging
+from datetime import datetime
+
+DB_PATH = os.getenv("CHART_DB_PATH", "location/charts.db")
+
+# Where the old per-day JSON files live: station -> (env var, file prefix)
+LEGACY_LOCATIONS = {
+    "myfm": ("MYFM_LOCATION", "myfm"),
+    "988": ("988_LOCATION", "988"),
+    "eightfm": ("EIGHT_LOCATION", "eightfm"),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS charts (
+    content_hash TEXT PRIMARY KEY,
+    row_count    INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chart_rows (
+    content_hash TEXT NOT NULL REFERENCES charts(content_hash),
+    position     INTEGER NOT NULL,
+    rank         INTEGER NOT NULL,
+    title        TEXT NOT NULL,
+    artist       TEXT NOT NULL,
+    spotify_link TEXT,
+    PRIMARY KEY (content_hash, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS snapshots (
+    station      TEXT NOT NULL,
+    chart_date   TEXT NOT NULL,
+    content_hash TEXT NOT NULL REFERENCES charts(content_hash),
+    source       TEXT,
+    created_at   TEXT NOT NULL,
+    PRIMARY KEY (station, chart_date)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS snapshots_by_hash ON snapshots (content_hash);
+"""
+
+
+def connect(path=None):
+    path = path or DB_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+# One row schema for every station: eightFM calls the title "song" and wraps
+# its rows in {"source", "date", "chart"}; the others are bare lists.
+def standard_rows(chart):
+    if isinstance(chart, dict):
+        chart = chart.get("chart", [])
+    rows = []
+    for row in chart:
+        rows.append({
+            "rank": int(row["rank"]),
+            "title": row.get("title", row.get("song")),
+            "artist": row["artist"],
+            "spotify_link": row.get("spotify_link"),
+        })
+    return rows
+
+
+def content_hash(rows):
+    payload = json.dumps(rows, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def today():
+    return datetime.now().strftime("%Y-%m-%d")
+
+
+# Store `chart` as the station's snapshot for `chart_date` (default today).
+# Returns the content hash. An empty chart is refused: it would replace the
+# day's snapshot with nothing.
+def save_snapshot(station, chart, chart_date=None, source=None, conn=None):
+    rows = standard_rows(chart)
+    if not rows:
+        raise ValueError(f"refusing to save an empty {station} chart")
+    digest = content_hash(rows)
+    own_conn = conn is None
+    conn = conn or connect()
+    try:
+        with conn:
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO charts (content_hash, row_count) VALUES (?, ?)", (digest, len(rows))
+            ).rowcount
+            if inserted:
+                conn.executemany(
+                    "INSERT INTO chart_rows (content_hash, position, rank, title, artist, spotify_link) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [(digest, i, r["rank"], r["title"], r["artist"], r["spotify_link"]) for i, r in enumerate(rows, 1)]
+                )
+            conn.execute(
+                "INSERT OR REPLACE INTO snapshots (station, chart_date, content_hash, source, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (station, chart_date or today(), digest, source, datetime.now().isoformat(timespec="seconds"))
+            )
+    finally:
+        if own_conn:
+            conn.close()
+    return digest
+
+
+def _rows_for(conn, digest):
+    cur = conn.execute(
+        "SELECT rank, title, artist, spotify_link FROM chart_rows WHERE content_hash = ? ORDER BY position",
+        (digest,)
+    )
+    return [dict(row) for row in cur]
+
+
+# Newest snapshot for a station (optionally on/before a date) as
+# {"station", "date", "content_hash", "rows"}, or None.
+def latest_snapshot(station, on_or_before=None, conn=None):
+    own_conn = conn is None
+    conn = conn or connect()
+    try:
+        row = conn.execute(
+            "SELECT chart_date, content_hash FROM snapshots WHERE station = ? AND chart_date <= ? "
+            "ORDER BY chart_date DESC LIMIT 1",
+            (station, on_or_before or "9999-12-31")
+        ).fetchone()
+        if not row:
+            return None
+        return {
+            "station": station,
+            "date": row["chart_date"],
+            "content_hash": row["content_hash"],
+            "rows": _rows_for(conn, row["content_hash"]),
+        }
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def load_snapshot(station, chart_date=None, conn=None):
+    snapshot = latest_snapshot(station, chart_date, conn)
+    if snapshot and (chart_date is None or snapshot["date"] == chart_date):
+        return snapshot["rows"]
+    return []
+
+
+# Every row of a station's snapshots in [start, end], ordered by date and rank:
+# [{"date", "rank", "title", "artist", "spotify_link"}]
+def load_history(station, start=None, end=None, conn=None):
+    own_conn = conn is None
+    conn = conn or connect()
+    try:
+        cur = conn.execute(
+            "SELECT s.chart_date AS date, r.rank, r.title, r.artist, r.spotify_link "
+            "FROM snapshots s JOIN chart_rows r ON r.content_hash = s.content_hash "
+            "WHERE s.station = ? AND s.chart_date BETWEEN ? AND ? "
+            "ORDER BY s.chart_date, r.position",
+            (station, start or "0000-01-01", end or "9999-12-31")
+        )
+        return [dict(row) for row in cur]
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def list_stations(conn=None):
+    own_conn = conn is None
+    conn = conn or connect()
+    try:
+        return [row[0] for row in conn.execute("SELECT DISTINCT station FROM snapshots ORDER BY station")]
+    finally:
+        if own_conn:
+            conn.close()
+
+
+# === Importer for the old per-day JSON files ===
+# Empty days and days that repeat the previous day's chart are skipped: they
+# are not new editions and would inflate weeks-on-chart.
+def import_legacy_files(conn=None):
+    own_conn = conn is None
+    conn = conn or connect()
+    imported = 0
+    try:
+        for station, (env_name, prefix) in LEGACY_LOCATIONS.items():
+            folder = os.getenv(env_name)
+            if not folder:
+                logging.info(f"[{station}] {env_name} is not set, nothing to import.")
+                continue
+            previous = None
+            for path in sorted(glob.glob(os.path.join(folder, f"{prefix}_[0-9]*.json"))):
+                match = re.search(r"_(\d{4})(\d{2})(\d{2})\.json$", path)
+                if not match:
+                    continue
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        chart = json.load(f)
+                    digest = content_hash(standard_rows(chart))
+                    if digest == previous:
+                        logging.info(f"Skipping {path}: same chart as the previous day")
+                        continue
+                    save_snapshot(station, chart, "-".join(match.groups()), source="import", conn=conn)
+                    previous = digest
+                    imported += 1
+                except (OSError, ValueError, KeyError) as e:
+                    logging.warning(f"Skipping {path}: {e}")
+        logging.info(f"Imported {imported} snapshot files into {DB_PATH}.")
+        return imported
+    finally:
+        if own_conn:
+            conn.close()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    command = sys.argv[1] if len(sys.argv) > 1 else "import"
+    if command == "import":
+        import_legacy_files()
+    elif command == "history":
+        print(json.dumps(load_history(sys.argv[2]), indent=2, ensure_ascii=False))
+    else:
+        sys.exit(f"Unknown command: {command}")
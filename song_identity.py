@@ -0,0 +1,265 @@
+# song_identity.py
+# Canonical song IDs across stations. The same song is spelled differently on
+# MY FM, 988 and EIGHT FM (Simplified vs Traditional characters, "feat."
+# variants, "A & B" vs "A, B", 988's "｜" suffix, "MC 张天赋" vs "MC张天赋"),
+# so every (title, artist) is resolved to one song ID before merging, caching
+# or joining.
+#
+#   python song_identity.py 未來的昨天 "Alex Warren feat. ROSÉ"
+#
+# Resolution order:
+#   1. exact alias lookup on the normalized (title, artists) key;
+#   2. candidate blocking: only songs sharing the normalized title or one of the
+#      artists are scored, so matching never compares against the whole catalog;
+#   3. fuzzy scoring of those candidates (title similarity + share of credited
+#      artists in common); short titles ("Love", "Stay") must match exactly.
+# Whatever matched (or the new song) is written back as an alias, so the next
+# run resolves the same spelling with a single indexed lookup.
+
+import re
+import sys
+import hashlib
+import logging
+import unicodedata
+from datetime import datetime
+from difflib import SequenceMatcher
+
+from snapshot_store import connect
+
+IDENTITY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS songs (
+    song_id    TEXT PRIMARY KEY,
+    title      TEXT NOT NULL,
+    artist     TEXT NOT NULL,
+    title_key  TEXT NOT NULL,
+    artist_key TEXT NOT NULL,
+    created_at TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS song_aliases (
+    alias_key TEXT PRIMARY KEY,
+    song_id   TEXT NOT NULL REFERENCES songs(song_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS song_blocks (
+    block_key TEXT NOT NULL,
+    song_id   TEXT NOT NULL REFERENCES songs(song_id),
+    PRIMARY KEY (block_key, song_id)
+) WITHOUT ROWID;
+"""
+
+TITLE_MATCH = 0.88
+ARTIST_MATCH = 0.5  # more than this share of credited artists must be shared
+SHORT_TITLE = 6  # title keys shorter than this must match exactly ("love" vs "lover")
+
+# Traditional -> Simplified for characters common in chart titles and artist
+# names. Always this table, never an optional converter: song IDs, alias keys
+# and the Spotify/YouTube cache keys must not depend on what is installed.
+# Only characters that do not occur in Simplified text are mapped, so titles
+# that are already Simplified pass through unchanged (著名, 覆盖).
+_T2S_PAIRS = (
+    "來来 們们 個个 會会 愛爱 說说 時时 間间 這这 裡里 後后 開开 關关 見见 過过 還还 為为 與与 從从 對对 無无 樂乐 聽听 聲声 "
+    "夢梦 戀恋 傷伤 淚泪 憶忆 憂忧 鬱郁 風风 雲云 電电 靈灵 體体 華华 國国 語语 車车 東东 陽阳 陰阴 塵尘 歲岁 綠绿 紅红 藍蓝 "
+    "黃黄 銀银 錢钱 鐘钟 鏡镜 長长 門门 問问 閃闪 難难 離离 雙双 飛飞 麗丽 顏颜 頭头 號号 樣样 種种 歡欢 憐怜 懷怀 戰战 掛挂 "
+    "換换 擁拥 擇择 數数 條条 極极 權权 氣气 漢汉 濃浓 灣湾 燈灯 獨独 現现 環环 畫画 當当 發发 盡尽 眾众 碼码 禮礼 筆笔 簡简 "
+    "紀纪 約约 紙纸 純纯 級级 細细 終终 結结 給给 絕绝 經经 維维 網网 線线 練练 總总 緣缘 縱纵 繼继 續续 義义 習习 聞闻 聯联 "
+    "腦脑 腳脚 興兴 舊旧 萬万 葉叶 蘭兰 處处 虛虚 術术 衛卫 衝冲 補补 視视 親亲 覺觉 觀观 認认 讓让 記记 許许 話话 該该 誰谁 "
+    "請请 讀读 變变 讚赞 貓猫 負负 費费 買买 賣卖 質质 贏赢 趕赶 跡迹 軟软 輕轻 較较 輸输 辦办 運运 進进 遠远 適适 選选 遲迟 "
+    "邊边 鄉乡 醫医 釋释 錯错 鍵键 陣阵 陳陈 陸陆 隊队 隨随 險险 隱隐 雖虽 雜杂 響响 順顺 須须 預预 領领 題题 願愿 類类 顯显 "
+    "飯饭 餘余 館馆 馬马 驚惊 髮发 鬥斗 魚鱼 鳥鸟 鳳凤 麼么 齊齐 龍龙 瑪玛 嗎吗 媽妈 學学 寫写 實实 寶宝 將将 專专 尋寻 導导 "
+    "屬属 帶带 幫帮 廣广 張张 彈弹 彎弯 徹彻 復复 憑凭 應应 懶懒 戲戏 擊击 擔担 敗败 斷断 書书 業业 殺杀 殘残 淺浅 溫温 滿满 "
+    "漸渐 潔洁 濕湿 灑洒 煙烟 熱热 爺爷 牆墙 猶犹 產产 畢毕 異异 療疗 盤盘 確确 穩稳 窮穷 範范 緊紧 編编 繞绕 羅罗 聖圣 脫脱 "
+    "藝艺 藥药 蘇苏 裝装 製制 複复 訴诉 詩诗 誠诚 誤误 調调 談谈 謝谢 識识 護护 豐丰 貴贵 賴赖 轉转 辭辞 違违 遙遥 鄰邻 鋼钢 "
+    "鐵铁 閉闭 闖闯 靜静 韓韩 頻频 顆颗 飄飘 餓饿 驗验 髒脏 鬧闹 鬆松 麥麦 點点 齡龄 倆俩 傳传 僅仅 優优 兒儿 兩两 冊册 劃划 "
+    "勁劲 勝胜 勢势 區区 協协 單单 卻却 員员 喚唤 嘆叹 團团 園园 圍围 圖图 執执 夠够 奮奋 孫孙 寧宁 層层 嶺岭 師师 幣币 幹干 "
+    "庫库 彥彦 徑径 憤愤 懸悬 擬拟 曉晓 曆历 朧胧 棄弃 標标 樹树 橋桥 機机 檔档 歸归 歷历 沒没 淪沦 滅灭 漁渔 爭争 獵猎 瑣琐 "
+    "瘋疯 癡痴 皚皑 睏困 矇蒙 祕秘 禱祷 穀谷 窩窝 竊窃 筍笋 籠笼 紛纷 絲丝 綁绑 緒绪 縫缝 繪绘 罰罚 翹翘 聰聪 膽胆 臉脸 虧亏 "
+    "螢萤 蠻蛮 襲袭 訂订 評评 詞词 試试 詭诡 謎谜 譜谱 豔艳 貞贞 賞赏 贈赠 趨趋 蹟迹 躍跃 軍军 輝辉 轟轰 遺遗 鈴铃 錄录 鍋锅 "
+    "鎖锁 閱阅 雞鸡 霧雾 韻韵 頌颂 頑顽 颱台 飲饮 騙骗 鬍胡 鯨鲸 鶴鹤 麵面 黨党 齣出"
+)
+_T2S_TABLE = str.maketrans({pair[0]: pair[1] for pair in _T2S_PAIRS.split() if len(pair) == 2})
+
+# "(feat. X)" in brackets, or " feat. X" / " - ft. X" after a separator; never
+# inside a word ("Lift Me Up", "Soft Spot")
+_FEAT = r"\b(?:feat|ft|featuring)\b\.?"
+_FEAT_RE = re.compile(
+    rf"\s*[\(\[（【]\s*{_FEAT}\s*([^\)\]）】]*)[\)\]）】]?|(?:\s+|\s*[-–—]\s*){_FEAT}\s+(.+)$",
+    re.IGNORECASE)
+# 和/與/与 only split when set apart by spaces: "张和平" is one name
+_ARTIST_SPLIT_RE = re.compile(
+    rf"\s*(?:,|，|、|&|＆|/|／|;|\bx\b|{_FEAT})\s*|\s+(?:和|與|与)\s+",
+    re.IGNORECASE)
+_PUNCT_RE = re.compile(r"[\W_]+", re.UNICODE)
+_CJK_RE = re.compile(r"[㐀-鿿豈-﫿]+")
+_LATIN_RE = re.compile(r"[a-z0-9]+")
+
+def to_simplified(text):
+    return text.translate(_T2S_TABLE)
+
+
+def clean_text(text):
+    text = unicodedata.normalize("NFKC", str(text or ""))
+    return to_simplified(text).casefold()
+
+
+def compact(text):
+    return _PUNCT_RE.sub("", text)
+
+
+# "数到十｜电视剧主题曲 (feat. X)" -> "数到十"; featured artists are returned separately
+def normalize_title(title):
+    text = clean_text(title)
+    text = re.split(r"[｜|]", text, maxsplit=1)[0]
+    featured = [m.group(1) or m.group(2) for m in _FEAT_RE.finditer(text)]
+    text = _FEAT_RE.sub("", text)
+    text = re.sub(r"[\(\[（【][^\)\]）】]*(?:version|ver\.?|remix|live|edit|版)[^\)\]）】]*[\)\]）】]", "", text)
+    return compact(text), featured
+
+
+# Every artist credited, compacted; "Priscilla Abby 蔡恩雨" also yields its
+# Chinese and Latin names separately so either spelling matches.
+def artist_tokens(artist, featured=()):
+    tokens = set()
+    names = _ARTIST_SPLIT_RE.split(clean_text(artist))
+    for extra in featured:
+        names.extend(_ARTIST_SPLIT_RE.split(extra))
+    for name in names:
+        full = compact(name)
+        if not full:
+            continue
+        tokens.add(full)
+        cjk = "".join(_CJK_RE.findall(name))
+        latin = "".join(_LATIN_RE.findall(name))
+        if cjk and latin:
+            tokens.add(cjk)
+            tokens.add(latin)
+    return tokens
+
+
+def song_keys_for(title, artist):
+    title_key, featured = normalize_title(title)
+    tokens = artist_tokens(artist, featured)
+    alias_key = f"{title_key}␟{'+'.join(sorted(tokens))}"
+    return title_key, tokens, alias_key
+
+
+# ID for a song with no match, seeded from its full alias key. A song that
+# already holds the ID is a different song (it did not match), so the seed is
+# extended until the ID is free.
+def new_song_id(conn, alias_key):
+    seed, n = alias_key, 0
+    while True:
+        song_id = "song_" + hashlib.sha1(seed.encode("utf-8")).hexdigest()[:12]
+        if conn.execute("SELECT 1 FROM songs WHERE song_id = ?", (song_id,)).fetchone() is None:
+            return song_id
+        n += 1
+        seed = f"{alias_key}␟{n}"
+
+
+def ensure_schema(conn):
+    conn.executescript(IDENTITY_SCHEMA)
+
+
+# Credited artists in a token set: a mixed "Name 名字" token stands for one
+# artist together with its Chinese and Latin part-tokens.
+def credited_names(tokens):
+    return {token: {token} | {part for part in tokens if part != token and part in token}
+            for token in tokens if not any(token != other and token in other for other in tokens)}
+
+
+# Share of credited artists (on both sides) found on the other side; without
+# any shared name, the closest spelling of any two names
+def artist_overlap(tokens, other_key):
+    other = set(other_key.split("+")) if other_key else set()
+    if not tokens or not other:
+        return 0.0
+    shared = tokens & other
+    if not shared:
+        return max(SequenceMatcher(None, a, b).ratio() for a in tokens for b in other)
+    names, other_names = credited_names(tokens), credited_names(other)
+    matched = sum(1 for aliases in names.values() if aliases & shared)
+    matched += sum(1 for aliases in other_names.values() if aliases & shared)
+    return matched / (len(names) + len(other_names))
+
+
+# Best existing song for the normalized keys, using only blocked candidates
+def match_candidates(conn, title_key, tokens):
+    block_keys = [f"t:{title_key}"] + [f"a:{token}" for token in tokens]
+    placeholders = ",".join("?" * len(block_keys))
+    candidates = conn.execute(
+        f"SELECT DISTINCT s.song_id, s.title_key, s.artist_key FROM song_blocks b "
+        f"JOIN songs s ON s.song_id = b.song_id WHERE b.block_key IN ({placeholders})",
+        block_keys
+    ).fetchall()
+
+    best_id, best_score = None, 0.0
+    for song_id, cand_title, cand_artist in candidates:
+        if cand_title == title_key:
+            title_score = 1.0
+        elif min(len(title_key), len(cand_title)) < SHORT_TITLE:
+            continue
+        else:
+            title_score = SequenceMatcher(None, title_key, cand_title).ratio()
+        if title_score < TITLE_MATCH:
+            continue
+        # "Love" by Lady Gaga & Bruno Mars vs Lady Gaga & Tony Bennett scores
+        # exactly 0.5: one shared artist is not enough
+        artist_score = artist_overlap(tokens, cand_artist)
+        if artist_score <= ARTIST_MATCH:
+            continue
+        score = title_score + artist_score
+        if score > best_score:
+            best_id, best_score = song_id, score
+    return best_id
+
+
+def _resolve(conn, title, artist, memo):
+    title_key, tokens, alias_key = song_keys_for(title, artist)
+    if alias_key in memo:
+        return memo[alias_key]
+    row = conn.execute("SELECT song_id FROM song_aliases WHERE alias_key = ?", (alias_key,)).fetchone()
+    if row:
+        memo[alias_key] = row[0]
+        return row[0]
+
+    song_id = match_candidates(conn, title_key, tokens)
+    if song_id is None:
+        song_id = new_song_id(conn, alias_key)
+        conn.execute(
+            "INSERT INTO songs (song_id, title, artist, title_key, artist_key, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (song_id, title, artist, title_key, "+".join(sorted(tokens)), datetime.now().isoformat(timespec="seconds"))
+        )
+    else:
+        logging.debug(f"Matched '{title}' / '{artist}' to {song_id}")
+    conn.execute("INSERT OR IGNORE INTO song_aliases (alias_key, song_id) VALUES (?, ?)", (alias_key, song_id))
+    conn.executemany(
+        "INSERT OR IGNORE INTO song_blocks (block_key, song_id) VALUES (?, ?)",
+        [(f"t:{title_key}", song_id)] + [(f"a:{token}", song_id) for token in tokens]
+    )
+    memo[alias_key] = song_id
+    return song_id
+
+
+# Song IDs for a batch of (title, artist) pairs, in one transaction
+def resolve_many(pairs, conn=None):
+    own_conn = conn is None
+    conn = conn or connect()
+    try:
+        ensure_schema(conn)
+        memo = {}
+        with conn:
+            return [_resolve(conn, title, artist, memo) for title, artist in pairs]
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def resolve_song(title, artist, conn=None):
+    return resolve_many([(title, artist)], conn)[0]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    if len(sys.argv) != 3:
+        sys.exit("usage: python song_identity.py <title> <artist>")
+    title_key, tokens, alias_key = song_keys_for(sys.argv[1], sys.argv[2])
+    print(f"title key: {title_key}\nartists:   {sorted(tokens)}\nsong id:   {resolve_song(sys.argv[1], sys.argv[2])}")
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The scripts are top-level modules; Spotify/ modules import them the same way
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "Spotify"))
@@ -0,0 +1,45 @@
+import pytest
+
+pytest.importorskip("pandas")
+import aggregate_chart
+import snapshot_store
+from aggregate_chart import aggregate, frame_from_charts
+
+
+@pytest.fixture(autouse=True)
+def chart_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot_store, "DB_PATH", str(tmp_path / "charts.db"))
+
+
+def chart(*entries):
+    return [{"rank": rank, "title": title, "artist": "Artist " + title} for title, rank in entries]
+
+
+def points(rows):
+    return [(row["title"], row["points"]) for row in rows]
+
+
+def test_borda_points_add_up_across_stations():
+    rows = aggregate(frame_from_charts({"myfm": chart(("B", 1), ("C", 2)), "988": chart(("A", 1), ("B", 2))}))
+    assert points(rows) == [("B", 39.0), ("A", 20.0), ("C", 19.0)]
+    assert [(row["rank"], row["stations"], row["best_rank"]) for row in rows] == [(1, 2, 1), (2, 1, 1), (3, 1, 2)]
+
+
+def test_points_ties_go_to_more_stations_then_best_rank():
+    rows = aggregate(frame_from_charts({
+        "myfm": chart(("Solo", 1), ("Both", 11), ("Low", 3)),
+        "988": chart(("Both", 11), ("High", 2), ("Late", 4)),
+        "eightfm": chart(("Low", 18), ("High", 19)),
+    }))
+    # Solo and Both have 20 points: Both is on two stations. High and Low have
+    # 21: High peaked at 2, Low at 3.
+    assert points(rows)[:4] == [("High", 21.0), ("Low", 21.0), ("Both", 20.0), ("Solo", 20.0)]
+
+
+def test_weekly_window_takes_each_stations_latest_edition():
+    snapshot_store.save_snapshot("myfm", chart(("Old", 1)), chart_date="2026-09-07")
+    snapshot_store.save_snapshot("myfm", chart(("New", 1)), chart_date="2026-09-14")
+    snapshot_store.save_snapshot("myfm", chart(("Future", 1)), chart_date="2026-09-21")
+    snapshot_store.save_snapshot("988", chart(("Other", 2)), chart_date="2026-09-07")
+    rows = aggregate_chart.weekly_chart("2026-09-14")
+    assert points(rows) == [("New", 20.0), ("Other", 19.0)]
@@ -0,0 +1,114 @@
+import pytest
+
+pytest.importorskip("pandas")
+import chart_analytics
+import snapshot_store
+
+# Four weekly editions: a climber, a song that drops out and re-enters, a new
+# entry, and a spelling variant that must count as the same song
+WEEKS = {
+    "2026-09-07": [("Song A", "Artist 1"), ("Song B", "Artist 2"), ("Song C", "Artist 3")],
+    "2026-09-14": [("Song B", "Artist 2"), ("Song A", "Artist 1"), ("Song D", "Artist 4")],
+    "2026-09-21": [("Song A (feat. Guest)", "Artist 1"), ("Song C", "Artist 3"), ("Song D", "Artist 4")],
+    "2026-09-28": [("Song C", "Artist 3"), ("Song A", "Artist 1"), ("Song E", "Artist 5")],
+}
+
+
+@pytest.fixture(autouse=True)
+def chart_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot_store, "DB_PATH", str(tmp_path / "charts.db"))
+
+
+def save_week(date, station="myfm"):
+    chart = [{"rank": rank, "title": title, "artist": artist}
+             for rank, (title, artist) in enumerate(WEEKS[date], 1)]
+    snapshot_store.save_snapshot(station, chart, chart_date=date)
+
+
+def stored_stats(station="myfm"):
+    conn = chart_analytics.stats_connect()
+    try:
+        rows = conn.execute("SELECT * FROM song_stats WHERE station = ? ORDER BY song_key", (station,)).fetchall()
+        state = tuple(conn.execute("SELECT last_date, editions FROM stats_state WHERE station = ?",
+                                   (station,)).fetchone())
+    finally:
+        conn.close()
+    return [dict(row) for row in rows], state
+
+
+def by_title(stats):
+    return {row["title"]: row for row in stats}
+
+
+def test_incremental_matches_full_rebuild():
+    for date in WEEKS:
+        save_week(date)
+        chart_analytics.apply_snapshot("myfm")
+    incremental = stored_stats()
+
+    chart_analytics.rebuild_stats("myfm")
+    assert stored_stats() == incremental
+
+
+def test_same_day_replacement_is_picked_up():
+    save_week("2026-09-07")
+    chart_analytics.apply_snapshot("myfm")
+    # A second run the same day stores a changed chart under the same date
+    snapshot_store.save_snapshot("myfm", [{"rank": 1, "title": "Song C", "artist": "Artist 3"},
+                                          {"rank": 2, "title": "Song A", "artist": "Artist 1"}],
+                                 chart_date="2026-09-07")
+    chart_analytics.apply_snapshot("myfm")
+    incremental, state = stored_stats()
+    assert {row["title"]: row["last_rank"] for row in incremental} == {"Song C": 1, "Song A": 2}
+    assert state == ("2026-09-07", 1)
+
+    chart_analytics.rebuild_stats("myfm")
+    assert stored_stats() == (incremental, state)
+
+
+def test_incremental_after_several_snapshots_at_once():
+    dates = list(WEEKS)
+    save_week(dates[0])
+    chart_analytics.apply_snapshot("myfm")
+    for date in dates[1:]:
+        save_week(date)
+    chart_analytics.apply_snapshot("myfm")
+    incremental = stored_stats()
+
+    chart_analytics.rebuild_stats("myfm")
+    assert stored_stats() == incremental
+
+
+def test_trajectory_stats():
+    for date in WEEKS:
+        save_week(date)
+        chart_analytics.apply_snapshot("myfm")
+    stats, state = stored_stats()
+    assert state == ("2026-09-28", 4)
+    songs = by_title(stats)
+
+    # The feat. variant is folded into Song A: on all four editions
+    assert len(stats) == 5
+    song_a = songs["Song A"]
+    assert (song_a["weeks"], song_a["peak"], song_a["last_rank"], song_a["prev_rank"]) == (4, 1, 2, 1)
+    assert song_a["debut"] == "2026-09-07"
+
+    # Song C skipped 2026-09-14, charted again on 2026-09-21, then climbed
+    song_c = songs["Song C"]
+    assert (song_c["weeks"], song_c["peak"], song_c["last_rank"], song_c["prev_rank"]) == (3, 1, 1, 2)
+
+    # Song D last charted the week before the newest edition: no movement data for it
+    assert songs["Song D"]["last_edition"] == 3
+    assert songs["Song E"]["prev_rank"] is None and songs["Song E"]["weeks"] == 1
+
+
+def test_annotate_chart_marks_new_and_movement():
+    for date in WEEKS:
+        save_week(date)
+        chart_analytics.apply_snapshot("myfm")
+    chart = [{"rank": rank, "title": title, "artist": artist}
+             for rank, (title, artist) in enumerate(WEEKS["2026-09-28"], 1)]
+    trends = [row["trend"] for row in chart_analytics.annotate_chart("myfm", chart)]
+    assert trends[0]["movement"] == 1 and not trends[0]["new"]
+    assert trends[1]["movement"] == -1
+    assert trends[2]["new"]
@@ -0,0 +1,43 @@
+import pytest
+
+from chart_render import LAYOUTS, Column, render, render_all
+
+ROWS = [
+    {"rank": 1, "title": "Tom & Jerry <3", "artist": "A <b>bold</b> & co",
+     "spotify_link": "javascript:alert(1)"},
+    {"rank": 2, "song": "Fish & Chips", "artist": "Cook",
+     "spotify_link": "https://open.spotify.com/search/fish%20&%20chips"},
+]
+
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+def test_titles_and_artists_are_escaped(layout):
+    html = render(ROWS, layout)
+    assert "Tom &amp; Jerry &lt;3" in html
+    assert "A &lt;b&gt;bold&lt;/b&gt; &amp; co" in html
+    assert "Fish &amp; Chips" in html
+    assert "<b>bold</b>" not in html
+
+
+@pytest.mark.parametrize("layout", ["table", "list"])
+def test_only_http_links_are_kept(layout):
+    html = render(ROWS, layout)
+    assert "javascript:" not in html
+    assert "href='#'" in html
+    assert "href='https://open.spotify.com/search/fish%20&amp;%20chips'" in html
+
+
+def test_custom_link_columns_are_filtered():
+    columns = [Column("排名", "rank"), Column("歌曲", "title"), Column("YouTube", "youtube", link=True)]
+    html = render([{"rank": 1, "title": "<x>", "youtube": " JavaScript:alert(1)"}], "table", columns=columns)
+    assert "&lt;x&gt;" in html and "JavaScript" not in html and "href='#'" in html
+
+
+def test_render_all_matches_each_layout():
+    rows = ROWS + [{"rank": 3, "title": "Up", "artist": "B", "spotify_link": "http://x",
+                    "trend": {"new": False, "movement": 2, "peak": 1, "weeks": 4}}]
+    pages = render_all(rows, theme="988", heading="988 & co")
+    assert list(pages) == list(LAYOUTS)
+    for layout in LAYOUTS:
+        assert pages[layout] == render(rows, layout, theme="988", heading="988 & co")
+    assert "▲2" in pages["table"] and "▲2" in pages["list"]
@@ -0,0 +1,108 @@
+import pytest
+
+import job_queue
+from job_queue import JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.db"))
+
+
+def boom(payload, queue):
+    raise RuntimeError("blogger down")
+
+
+def make_ready(queue):
+    queue.conn.execute("UPDATE jobs SET available_at = 0 WHERE status = 'queued'")
+
+
+def row(queue, key):
+    return dict(queue.conn.execute("SELECT * FROM jobs WHERE job_key = ?", (key,)).fetchone())
+
+
+def test_backoff_doubles_and_caps():
+    assert job_queue.backoff(1) == job_queue.BACKOFF_BASE
+    assert job_queue.backoff(3) == job_queue.BACKOFF_BASE * 4
+    assert job_queue.backoff(50) == job_queue.BACKOFF_MAX
+
+
+def test_failed_job_waits_for_its_backoff(queue):
+    queue.enqueue("publish", {"n": 1}, key="post")
+    assert queue.drain("publish", boom, max_wait=0) == {"done": 0, "failed": 1}
+    job = row(queue, "post")
+    assert job["status"] == "queued" and job["attempts"] == 1
+    assert queue.claim("publish") is None
+    assert queue.next_ready_in("publish") > job_queue.BACKOFF_BASE - 5
+
+
+def test_enqueue_keeps_attempts_across_runs(queue):
+    # Every run enqueues the same post again; the failures still add up
+    for _ in range(3):
+        queue.enqueue("publish", {"n": 1}, key="post", max_attempts=3)
+        make_ready(queue)
+        queue.drain("publish", boom, max_wait=0)
+    job = row(queue, "post")
+    assert job["status"] == "failed" and job["attempts"] == 3
+
+    # A later run does not revive it, but the retry command does
+    queue.enqueue("publish", {"n": 2}, key="post", max_attempts=3)
+    job = row(queue, "post")
+    assert job["status"] == "failed" and job["attempts"] == 3
+    assert queue.failed_jobs("publish")[0]["job_key"] == "post"
+    assert queue.retry_failed("publish") == 1
+    seen = []
+    queue.drain("publish", lambda payload, q: seen.append(payload), max_wait=0)
+    assert seen == [{"n": 2}]
+
+
+def test_enqueue_does_not_skip_backoff(queue):
+    queue.enqueue("publish", {"n": 1}, key="post")
+    queue.drain("publish", boom, max_wait=0)
+    queue.enqueue("publish", {"n": 2}, key="post")
+    assert queue.claim("publish") is None
+    assert row(queue, "post")["payload"] == '{"n": 2}'
+
+
+def test_done_job_starts_over_when_enqueued_again(queue):
+    queue.enqueue("render", {"n": 1}, key="chart")
+    queue.drain("render", lambda payload, q: None, max_wait=0)
+    queue.enqueue("render", {"n": 2}, key="chart")
+    job = row(queue, "chart")
+    assert job["status"] == "queued" and job["attempts"] == 0
+
+
+def test_same_key_is_one_job(queue):
+    queue.enqueue("render", {"n": 1}, key="chart")
+    queue.enqueue("render", {"n": 2}, key="chart")
+    queue.enqueue("render", {"n": 3})
+    seen = []
+    assert queue.drain("render", lambda payload, q: seen.append(payload["n"]), max_wait=0) == {"done": 2, "failed": 0}
+    assert seen == [2, 3]
+
+
+def test_handler_can_enqueue_the_next_stage(queue):
+    queue.enqueue("render", {"n": 1}, key="chart")
+    queue.drain("render", lambda payload, q: q.enqueue("publish", payload, key="post"), max_wait=0)
+    seen = []
+    queue.drain("publish", lambda payload, q: seen.append(payload), max_wait=0)
+    assert seen == [{"n": 1}]
+
+
+def test_abandoned_running_job_is_claimed_again(queue):
+    queue.enqueue("publish", {"n": 1}, key="post")
+    assert queue.claim("publish")["job_key"] == "post"
+    assert queue.claim("publish") is None
+    queue.conn.execute("UPDATE jobs SET started_at = started_at - ?", (job_queue.LEASE_SECONDS + 1,))
+    assert queue.claim("publish")["job_key"] == "post"
+
+
+def test_stats(queue):
+    queue.enqueue("render", {"n": 1}, key="a")
+    queue.enqueue("render", {"n": 2}, key="b", max_attempts=1)
+    queue.enqueue("render", {"n": 3}, key="c", delay=3600)
+    queue.drain("render", lambda payload, q: boom(payload, q) if payload["n"] == 2 else None, max_wait=0)
+    stats = queue.stats()["render"]
+    assert (stats["queued"], stats["running"], stats["done"], stats["failed"]) == (1, 0, 1, 1)
+    assert stats["avg_attempts"] == 1
+    assert stats["oldest_queued_s"] >= 0
@@ -0,0 +1,79 @@
+import types
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+import blogger_client
+from blogger_client import BloggerClient, PublishLedger, ledger_marker
+
+
+class FakeRequest:
+    def __init__(self, service, kind, body, post_id=None):
+        self.service, self.kind, self.body, self.post_id = service, kind, body, post_id
+
+    def execute(self, http=None):
+        self.service.calls.append((self.kind, self.post_id))
+        post_id = self.post_id or f"post-{len(self.service.calls)}"
+        return {"id": post_id, "url": f"https://blog/{post_id}", "title": self.body["title"]}
+
+
+class FakeService:
+    def __init__(self, live=()):
+        self.calls = []
+        self.live = list(live)
+
+    def posts(self):
+        service = self
+        return types.SimpleNamespace(
+            insert=lambda blogId, body, isDraft: FakeRequest(service, "insert", body),
+            patch=lambda blogId, postId, body: FakeRequest(service, "patch", body, postId),
+            list=lambda **kwargs: types.SimpleNamespace(execute=lambda: {"items": service.live}),
+        )
+
+
+@pytest.fixture
+def client():
+    client = BloggerClient(blog_id="blog")
+    client._service = FakeService()
+    return client
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return PublishLedger(str(tmp_path / "ledger.db"))
+
+
+def test_insert_then_skip_then_patch(client, ledger):
+    post = client.upsert_post("myfm:2026-W42", "Title", "<p>a</p>", ledger=ledger)
+    assert client._service.calls == [("insert", None)]
+    assert ledger.get("myfm:2026-W42")["status"] == "published"
+
+    again = client.upsert_post("myfm:2026-W42", "Title", "<p>a</p>", ledger=ledger)
+    assert again["skipped"] and again["id"] == post["id"]
+    assert len(client._service.calls) == 1
+
+    client.upsert_post("myfm:2026-W42", "Title", "<p>b</p>", ledger=ledger)
+    assert client._service.calls[-1] == ("patch", post["id"])
+
+
+def test_pending_entry_does_not_adopt_last_weeks_post(client, ledger):
+    # Same title every week: last week's live post must not be overwritten
+    client._service.live = [{"id": "last-week", "title": "Title",
+                             "content": "<p>old</p>" + ledger_marker("myfm:2026-W41")}]
+    ledger.record("myfm:2026-W42", "blog", "Title", "digest", "pending")
+    client.upsert_post("myfm:2026-W42", "Title", "<p>new</p>", ledger=ledger)
+    assert client._service.calls == [("insert", None)]
+
+
+def test_pending_entry_recovers_its_own_post(client, ledger):
+    client._service.live = [{"id": "this-week", "title": "Title",
+                             "content": "<p>new</p>" + ledger_marker("myfm:2026-W42")}]
+    ledger.record("myfm:2026-W42", "blog", "Title", "digest", "pending")
+    client.upsert_post("myfm:2026-W42", "Title", "<p>new</p>", ledger=ledger)
+    assert client._service.calls == [("patch", "this-week")]
+    assert ledger.get("myfm:2026-W42")["post_id"] == "this-week"
+
+
+def test_chart_week():
+    from datetime import datetime
+    assert blogger_client.chart_week(datetime(2026, 1, 1)) == "2026-W01"
@@ -0,0 +1,81 @@
+import pytest
+
+from snapshot_store import connect
+from song_identity import _T2S_PAIRS, artist_tokens, new_song_id, normalize_title, resolve_song, to_simplified
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = connect(str(tmp_path / "charts.db"))
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize("title, key", [
+    ("Lift Me Up", "liftmeup"),
+    ("Left and Right", "leftandright"),
+    ("Soft Spot", "softspot"),
+    ("Drift Away", "driftaway"),
+    ("数到十｜电视剧主题曲", "数到十"),
+    ("APT. (Live Version)", "apt"),
+])
+def test_title_words_are_not_cut(title, key):
+    assert normalize_title(title)[0] == key
+
+
+@pytest.mark.parametrize("title, featured", [
+    ("Die With A Smile (feat. Bruno Mars)", ["bruno mars"]),
+    ("Die With A Smile ft. Bruno Mars", ["bruno mars"]),
+    ("Die With A Smile - featuring Bruno Mars", ["bruno mars"]),
+])
+def test_featured_artists_are_split_off(title, featured):
+    assert normalize_title(title) == ("diewithasmile", featured)
+
+
+def test_simplified_text_is_left_alone():
+    assert to_simplified("覆盖 著名") == "覆盖 著名"
+    assert to_simplified("未來的昨天 周興哲") == "未来的昨天 周兴哲"
+
+
+def test_t2s_table_has_one_real_mapping_per_character():
+    pairs = _T2S_PAIRS.split()
+    assert all(len(pair) == 2 and pair[0] != pair[1] for pair in pairs)
+    assert len({pair[0] for pair in pairs}) == len(pairs)
+
+
+def test_artist_split():
+    assert artist_tokens("张和平") == {"张和平"}
+    assert artist_tokens("刘 和 张") == {"刘", "张"}
+    assert artist_tokens("Lady Gaga & Bruno Mars") == {"ladygaga", "brunomars"}
+    assert artist_tokens("Priscilla Abby 蔡恩雨") == {"priscillaabby蔡恩雨", "priscillaabby", "蔡恩雨"}
+
+
+@pytest.mark.parametrize("a, b", [
+    (("未來的昨天", "周興哲"), ("未来的昨天", "周兴哲")),
+    (("Die With A Smile", "Lady Gaga, Bruno Mars"), ("Die With A Smile (feat. Bruno Mars)", "Lady Gaga")),
+    (("Birds Of A Feather", "Billie Eilish"), ("Birds Of A Feathr", "Billie Eilish")),
+    (("未來的昨天", "Priscilla Abby 蔡恩雨"), ("未来的昨天", "蔡恩雨")),
+])
+def test_same_song_shares_an_id(conn, a, b):
+    assert resolve_song(*a, conn=conn) == resolve_song(*b, conn=conn)
+
+
+@pytest.mark.parametrize("a, b", [
+    (("Love", "Taylor Swift"), ("Lover", "Taylor Swift")),
+    (("Stay", "Justin Bieber"), ("Stray", "Justin Bieber")),
+    (("Love", "刘和张"), ("Love", "张和平")),
+    (("Birds Of A Feather", "Billie Eilish"), ("Birds Of A Feather", "Someone Else")),
+    (("Love", "A, B, C"), ("Love", "A, D, E")),
+    (("Love", "Lady Gaga & Bruno Mars"), ("Love", "Lady Gaga & Tony Bennett")),
+])
+def test_different_songs_keep_separate_ids(conn, a, b):
+    assert resolve_song(*a, conn=conn) != resolve_song(*b, conn=conn)
+
+
+def test_new_song_id_never_reuses_a_taken_id(conn):
+    resolve_song("Love", "A, B, C", conn=conn)
+    taken = new_song_id(conn, "love␟a+d+e")
+    # Another song already holds the ID this alias key hashes to
+    conn.execute("INSERT INTO songs (song_id, title, artist, title_key, artist_key, created_at) "
+                 "VALUES (?, 'x', 'y', 'x', 'y', '')", (taken,))
+    assert new_song_id(conn, "love␟a+d+e") != taken